@@ -37,11 +37,23 @@ from markov_func import getstationarydist
 Ldist = getstationarydist(transmissionarray)
 Lmean = np.sum(Ldist * exogstatevec)
 
-def getKd(R):
-    K = (A / (R - 1 + DELTA)) ** (1 / (1-ALPHA)) * Lmean
+def getKd(R, TFP = None):
+    """
+    TFP: productivity (A by default)
+    """
+    if TFP is None:
+        TFP = A
+    K = (TFP / (R - 1 + DELTA)) ** (1 / (1-ALPHA)) * Lmean
     return(K)
 
 
+def getW(R, TFP = None):
+    if TFP is None:
+        TFP = A
+    W = TFP * (TFP / (R - 1 + DELTA)) ** (ALPHA / (1-ALPHA))
+    return(W)
+
+
 def getKs(R):
     """
     This returns the aggregate 
@@ -49,20 +61,13 @@ def getKs(R):
 
     W = A * (A / (R - 1 + DELTA)) ** (ALPHA / (1-ALPHA))
 
-    ns1 = len(endogstatevec)
-    ns2 = len(exogstatevec)
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + W * exogstate - endogstate_future
+        return(C)
 
-    rewardarray = np.empty([ns1, ns2, ns1])
-    for s1 in range(ns1):
-        for s2 in range(ns2):
-            for s1prime in range(ns1):
-                
-                C = endogstatevec[s1] * R + W * exogstatevec[s2] - endogstatevec[s1prime]
-
-                if C > 0:
-                    rewardarray[s1, s2, s1prime] = np.log(C)
-                else:
-                    rewardarray[s1, s2, s1prime] = -1e8
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
 
     # set relatively imprecise criterion for speed
     V, pol = solvevfi_1endogstate_discrete(rewardarray, transmissionarray, beta = BETA, printinfo = False, crit = 1e-3)
@@ -77,20 +82,350 @@ def getKs(R):
     return(meanK)
 
 
-def getsolution():
+# reward and solver options used by getKs_warmstart (part of the key in getKs_cached)
+rewardoptions = {'utility': 'log', 'negvalue': -1e8}
+vfioptions = {'stoprule': 'supnorm', 'howard': None, 'search': 'brute'}
+
+def getbudgetfunction(R):
+    """
+    Budget constraint given R (W is pinned down by R).
+    """
+    W = A * (A / (R - 1 + DELTA)) ** (ALPHA / (1-ALPHA))
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + W * exogstate - endogstate_future
+        return(C)
+
+    return(budgetfunction)
+
+
+def getKs_warmstart(R, Vguess = None, fullstatedistguess = None, crit = 1e-6, precision = 'float64', returnpol = False):
+    """
+    Same as getKs but solve using the functions in func/ which can be warm started from the value function and the stationary distribution of a similar R.
+    Returns the aggregate capital supply, the value function and the stationary distribution so these can be used to warm start the next R.
+
+    precision: 'float32' builds a float32 rewardarray (in chunks of s1) and solves in float32 followed by a float64 polishing pass (see vfi_discrete_func.py) which halves the memory of the rewardarray
+    returnpol: also return the policy function
+    """
+    budgetfunction = getbudgetfunction(R)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from reward_func import getrewardfunction_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    from dist_func import getstationarydist_1endogstate_discrete_iterate
+
+    if precision == 'float32':
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, chunksize = 100, dtype = np.float32, **rewardoptions)
+        rewardfunction = getrewardfunction_1endogstate(budgetfunction, endogstatevec, exogstatevec, **rewardoptions)
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, crit = crit, Vguess = Vguess, precision = 'float32', polishsource = rewardfunction, blocksize = 100, **vfioptions)
+    else:
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, **rewardoptions)
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, crit = crit, Vguess = Vguess, **vfioptions)
+
+    fullstatedist, endogstatedist = getstationarydist_1endogstate_discrete_iterate(transmissionarray, pol, fullstatedistguess = fullstatedistguess)
+    meanK = np.sum(endogstatedist * endogstatevec)
+
+    if returnpol is True:
+        return(meanK, V, fullstatedist, pol)
+    else:
+        return(meanK, V, fullstatedist)
+
+
+def getKs_cached(R, Vguess = None, fullstatedistguess = None, crit = 1e-6, precision = 'float64', cachedir = None):
+    """
+    getKs_warmstart using the on-disk cache in cache_func.py. If R has been solved before with the same model, load the solution. Otherwise, if Vguess is None, warm start from the cached solution with the closest R.
+    The key covers the grids, the parameters, the budget constraint, rewardoptions, vfioptions, crit, precision and getKs_warmstart itself (with every function and global it uses - see updatehash in cache_func.py).
+    The entry also stores pol (the discrete polprobs are the indicator of pol so are not stored separately).
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from cache_func import cachedsolve
+
+    exact = {'model': 'aiyagari', 'endogstatevec': endogstatevec, 'exogstatevec': exogstatevec, 'transmissionarray': transmissionarray, 'BETA': BETA, 'A': A, 'ALPHA': ALPHA, 'DELTA': DELTA, 'budgetfunction': getbudgetfunction, 'rewardoptions': rewardoptions, 'vfioptions': vfioptions, 'crit': crit, 'precision': precision, 'getKs_warmstart': getKs_warmstart}
+
+    def solvefunction(warmstart):
+        if Vguess is None and warmstart is not None:
+            Ks, V, fullstatedist, pol = getKs_warmstart(R, Vguess = warmstart['V'], fullstatedistguess = warmstart['fullstatedist'], crit = crit, precision = precision, returnpol = True)
+        else:
+            Ks, V, fullstatedist, pol = getKs_warmstart(R, Vguess = Vguess, fullstatedistguess = fullstatedistguess, crit = crit, precision = precision, returnpol = True)
+        return({'Ks': np.array(Ks), 'V': V, 'fullstatedist': fullstatedist, 'pol': pol})
+
+    arrays = cachedsolve(solvefunction, exact, {'R': R}, cachedir = cachedir)
+
+    return(float(arrays['Ks']), arrays['V'], arrays['fullstatedist'])
+
+
+def getequilibrium(Rlow = None, Rhigh = None, xtol = 1e-6, crit = 1e-6, printinfo = True, cache = False, cachedir = None):
+    """
+    Solve for the equilibrium R where Kd(R) = Ks(R) using Brent's method rather than scanning a fixed grid of R.
+
+    First bracket the root: Kd(R) - Ks(R) is decreasing in R so lower Rlow until it is positive and raise Rhigh towards 1/BETA until it is negative.
+    Every VFI and stationary distribution is warm started from the solution for the closest R already solved which means later solves need few iterations.
+    Note that since the state space is discrete, Ks(R) is a step function so making xtol very small just locates the step more precisely.
+
+    cache: save every solve in the on-disk cache in cache_func.py (in cachedir) so rerunning loads the solutions rather than solving again
+    """
+    import scipy.optimize
+
+    if Rlow is None:
+        Rlow = 1 / BETA - 0.05
+    if Rhigh is None:
+        Rhigh = 1 / BETA - 0.005
+
+    # list of (R, Kd - Ks, V, fullstatedist) for every R solved
+    solved = []
+
+    def excessdemand(R):
+        # brentq reevaluates the bracket end points so reuse these
+        for solution in solved:
+            if solution[0] == R:
+                return(solution[1])
+
+        if len(solved) > 0:
+            closest = min(solved, key = lambda x: abs(x[0] - R))
+            Vguess = closest[2]
+            fullstatedistguess = closest[3]
+        else:
+            Vguess = None
+            fullstatedistguess = None
+
+        Kd = getKd(R)
+        if cache is True:
+            Ks, V, fullstatedist = getKs_cached(R, Vguess = Vguess, fullstatedistguess = fullstatedistguess, crit = crit, cachedir = cachedir)
+        else:
+            Ks, V, fullstatedist = getKs_warmstart(R, Vguess = Vguess, fullstatedistguess = fullstatedistguess, crit = crit)
+        solved.append((R, Kd - Ks, V, fullstatedist))
+
+        if printinfo is True:
+            print('R: ' + str(R) + '. Kd: ' + str(Kd) + '. Ks: ' + str(Ks) + '.')
+
+        return(Kd - Ks)
+
+    # bracket the root
+    maxbracket = 20
+    flow = excessdemand(Rlow)
+    bracketi = 0
+    while flow < 0:
+        bracketi = bracketi + 1
+        if bracketi > maxbracket:
+            raise ValueError('Failed to find Rlow with Kd > Ks.')
+        # need R > 1 - DELTA for Kd to be defined
+        Rlow = max(Rlow - (Rhigh - Rlow), (Rlow + 1 - DELTA) / 2)
+        flow = excessdemand(Rlow)
+
+    fhigh = excessdemand(Rhigh)
+    bracketi = 0
+    while fhigh > 0:
+        bracketi = bracketi + 1
+        if bracketi > maxbracket:
+            raise ValueError('Failed to find Rhigh with Kd < Ks.')
+        # need R < 1 / BETA for Ks to be finite
+        Rhigh = (Rhigh + 1 / BETA) / 2
+        fhigh = excessdemand(Rhigh)
+
+    Rstar = scipy.optimize.brentq(excessdemand, Rlow, Rhigh, xtol = xtol)
+    Kstar = getKd(Rstar)
+
+    if printinfo is True:
+        print('Equilibrium R: ' + str(Rstar) + '. K: ' + str(Kstar) + '. Number of solves: ' + str(len(solved)) + '.')
+
+    return(Rstar, Kstar)
+
+
+# Parallel:{{{1
+# names of the arrays which are shared with the worker processes
+sharedarraynames = ['endogstatevec', 'exogstatevec', 'transmissionarray']
+# keep the shared memory blocks open in the worker processes
+sharedmemorylist = []
+
+def parallel_initworker(sharedarrayspecs):
+    """
+    Run at the start of each worker process.
+    Replace the module level arrays with read-only views of the shared memory created in getKs_parallel so the arrays are not pickled for each task.
+    """
+    from multiprocessing import shared_memory
+
+    for arrayname, (shmname, shape, dtype) in sharedarrayspecs.items():
+        shm = shared_memory.SharedMemory(name = shmname)
+        sharedmemorylist.append(shm)
+        array = np.ndarray(shape, dtype = dtype, buffer = shm.buf)
+        array.flags.writeable = False
+        globals()[arrayname] = array
+
+
+def getKs_parallel(Rval, processes = None):
+    """
+    Compute getKs(R) for every R in Rval using a pool of processes.
+    endogstatevec, exogstatevec and transmissionarray are placed in shared memory once rather than sent to the workers with every R.
+    Returns Ks in the same order as Rval.
+    """
+    from multiprocessing import Pool
+    from multiprocessing import shared_memory
+
+    shmlist = []
+    sharedarrayspecs = {}
+    try:
+        for arrayname in sharedarraynames:
+            array = np.ascontiguousarray(globals()[arrayname], dtype = float)
+            shm = shared_memory.SharedMemory(create = True, size = array.nbytes)
+            shmlist.append(shm)
+            np.ndarray(array.shape, dtype = array.dtype, buffer = shm.buf)[...] = array
+            sharedarrayspecs[arrayname] = (shm.name, array.shape, array.dtype)
+
+        with Pool(processes = processes, initializer = parallel_initworker, initargs = (sharedarrayspecs,)) as pool:
+            Kslist = pool.map(getKs, list(Rval))
+    finally:
+        for shm in shmlist:
+            shm.close()
+            shm.unlink()
+
+    return(Kslist)
+
+
+# Transition:{{{1
+def margutilfunction(C):
+    return(1 / C)
+
+
+def invmargutilfunction(margutil):
+    return(1 / margutil)
+
+
+def exogstatefunction(R):
+    """
+    Income in each exogenous state given R (with TFP at its steady state value).
+    """
+    return(getW(R) * np.array(exogstatevec))
+
+
+def getKs_egm(R, polguess = None, crit = 1e-10, maxiter = 10000):
+    """
+    Aggregate capital supply using EGM and the stationary distribution from the lottery weights (see dist_func.py).
+    Unlike getKs, Ks(R) is smooth in R since the policy function is continuous. This is needed for the Jacobian in gettransition.
+    This iterates on the policy function like solveegm_1endogstate in egm_func.py but does not compute V since it is not needed.
+    Returns Ks, pol and fullstatedist.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from egm_func import egm_1endogstate_oneiteration
+    from dist_func import gentransmissionstararray_1endogstate_continuous_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+
+    # only iterate on the policy function since V is not needed
+    if polguess is None:
+        pol = np.full([len(endogstatevec), len(exogstatevec)], endogstatevec[0])
+    else:
+        pol = polguess
+    iterationi = 0
+    while True:
+        iterationi = iterationi + 1
+        polnew = egm_1endogstate_oneiteration(pol, margutilfunction, invmargutilfunction, endogstatevec, exogstatefunction(R), transmissionarray, BETA, R)
+        diff = np.max(np.abs(polnew - pol))
+        pol = polnew
+        if diff < crit:
+            break
+        if iterationi >= maxiter:
+            raise ValueError('EGM did not converge after ' + str(maxiter) + ' iterations at R = ' + str(R) + '.')
+
+    transmissionstararray = gentransmissionstararray_1endogstate_continuous_sparse(transmissionarray, pol, endogstatevec)
+    fullstatedist, endogstatedist = getstationarydist_1endogstate_sparse(transmissionstararray, len(endogstatevec))
+    meanK = np.sum(endogstatedist * endogstatevec)
+
+    return(meanK, pol, fullstatedist)
+
+
+def getsteadystate_egm(Rlow = None, Rhigh = None, xtol = 1e-12, printinfo = False):
+    """
+    Solve for the equilibrium R where Kd(R) = Ks(R) using getKs_egm.
+    Returns R, pol and fullstatedist in the steady state.
+    """
+    import scipy.optimize
+
+    if Rlow is None:
+        Rlow = 1 / BETA - 0.05
+    if Rhigh is None:
+        Rhigh = 1 / BETA - 0.005
+
+    # warm start each EGM from the last policy function
+    lastpol = [None]
+
+    def excessdemand(R):
+        Ks, pol, fullstatedist = getKs_egm(R, polguess = lastpol[0])
+        lastpol[0] = pol
+        return(getKd(R) - Ks)
+
+    Rstar = scipy.optimize.brentq(excessdemand, Rlow, Rhigh, xtol = xtol)
+    Ks, pol, fullstatedist = getKs_egm(Rstar, polguess = lastpol[0])
+
+    if printinfo is True:
+        print('Steady state R: ' + str(Rstar) + '. Kd: ' + str(getKd(Rstar)) + '. Ks: ' + str(Ks) + '.')
+
+    return(Rstar, pol, fullstatedist)
+
+
+def gettransition(T = 300, shocksize = 0.01, rho = 0.9, crit = 1e-8, cache = False, cachedir = None, printinfo = True):
+    """
+    Perfect foresight transition after an unexpected shock to productivity in period 0: TFP_t = A * (1 + shocksize * rho ** t).
+    The economy starts in the steady state (solved by EGM) and is back in the steady state after period T - 1.
+
+    Capital at the start of period 0 is given by the steady state distribution. Find the path of R_t such that Kd(R_t, TFP_t) = Ks_t for t = 0, ..., T - 1 where Ks_t is the capital supplied by households given the path of R (and the implied W_t = W(R_t, TFP_t)).
+    The Jacobian dKs_t / dR_s is computed once around the steady state using the fake news algorithm in sequencespace_func.py and then the path of R is solved by Newton's method.
+    Only the dependence of Ks upon R through W is included in the Jacobian (not the direct effect of TFP on W) but the residual at each Newton step uses the full path so the solution is exact.
+
+    cache: save the Jacobian in the on-disk cache in cache_func.py (in cachedir)
+
+    Returns a DataFrame with the paths of TFP, R, W and K.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from sequencespace_func import getjacobian_fakenews_egm
+    from sequencespace_func import getKpath
+    from sequencespace_func import solvetransition_newton
+
+    R_ss, pol_ss, fullstatedist_ss = getsteadystate_egm(printinfo = printinfo)
+
+    TFPpath = A * (1 + shocksize * rho ** np.arange(T))
+
+    def residualfunction(Rpath):
+        # income in each period depends upon TFP in that period as well as R
+        exogstatepath = [getW(Rpath[t], TFP = TFPpath[t]) * np.array(exogstatevec) for t in range(T)]
+        Kspath = getKpath(Rpath, exogstatepath, pol_ss, R_ss, exogstatefunction(R_ss), fullstatedist_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, BETA)
+        return(getKd(Rpath, TFP = TFPpath) - Kspath)
+
+    J = getjacobian_fakenews_egm(exogstatefunction, pol_ss, R_ss, fullstatedist_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, BETA, T, cache = cache, cachedir = cachedir)
+    # dKd / dR in the steady state
+    dKddR = -getKd(R_ss) / ((1 - ALPHA) * (R_ss - 1 + DELTA))
+    jacobian = np.diag(np.full(T, dKddR)) - J
+
+    Rpath, residual = solvetransition_newton(residualfunction, jacobian, np.full(T, R_ss), crit = crit, printinfo = printinfo)
+
+    df = pd.DataFrame({'TFP': TFPpath, 'R': Rpath, 'W': getW(Rpath, TFP = TFPpath), 'K': getKd(Rpath, TFP = TFPpath)})
+    if printinfo is True:
+        print(df.head(10))
+
+    return(df)
+
+
+# Solution:{{{1
+def getsolution(numR = 10, parallel = False, processes = None):
     """
     The steady state is about R = 1.233 and K = 4.8
+
+    numR: number of values of R to compute Kd and Ks for
+    parallel: compute Ks for each R in parallel using getKs_parallel
+    processes: number of processes to use if parallel is True (by default, the number of cores)
     """
-    Rval = np.linspace(1 / BETA - 0.05, 1 / BETA - 0.005, 10)
-    Kdlist = []
-    Kslist = []
-    for R in Rval:
-        Kdlist.append(getKd(R))
-        Kslist.append(getKs(R))
+    Rval = np.linspace(1 / BETA - 0.05, 1 / BETA - 0.005, numR)
+    Kdlist = [getKd(R) for R in Rval]
+    if parallel is True:
+        Kslist = getKs_parallel(Rval, processes = processes)
+    else:
+        Kslist = []
+        for R in Rval:
+            Kslist.append(getKs(R))
 
     df = pd.DataFrame({'R': Rval, 'Kd': Kdlist, 'Ks': Kslist})
     print('Solution where Kd and Ks intersect:')
     # not calculating precisely in the interest of time
+    # use getequilibrium() to solve for R precisely
     print(df)
 
 # Run:{{{1
@@ -82,9 +82,61 @@ def vfi_bound():
     return(V, pol)
 
 
-def full(nobound = False):
+def vfi_bound_batch(interpmethod = 'linear'):
+    """
+    Same as vfi_bound but maximise over every (s1, s2) at once in each iteration.
+    rewardfunction and boundfunction already work with arrays so they can be used unchanged.
+    interpmethod: interpolation of V between points of endogstatevec ('linear', 'pchip' or 'schumaker' - see interp_func.py). The shape-preserving methods give a policy function much closer to EGM on the same grid.
+    """
+
+    def rewardfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(np.log(C))
+
+    def boundfunction(endogstate_now, exogstate):
+        s1low = None
+        # must save strictly less than all assets today
+        s1high = endogstate_now * R + exogstate - 1e-4
+        return(s1low, s1high)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+    V, pol = solvevfi_1endogstate_continuous_batch(rewardfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = 'reward', interpmethod = interpmethod)
+
+    return(V, pol)
+
+
+def vfi_egm():
+    """
+    Solve the same problem using the endogenous grid method rather than running an optimizer for every state in every iteration.
+    Only need to specify utility, marginal utility and the inverse of marginal utility.
+    """
+    def utilityfunction(C):
+        return(np.log(C))
+
+    def margutilfunction(C):
+        return(1 / C)
+
+    def invmargutilfunction(margutil):
+        return(1 / margutil)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from egm_func import solveegm_1endogstate
+    V, pol = solveegm_1endogstate(utilityfunction, margutilfunction, invmargutilfunction, endogstatevec, exogstatevec, transmissionarray, BETA, R, printinfo = True)
+
+    return(V, pol)
+
+
+def full(nobound = False, egm = False, batch = False, interpmethod = 'linear'):
+    """
+    batch: solve the bounded method with all states maximised at once (see vfi_bound_batch)
+    interpmethod: interpolation method used with batch
+    """
     print('\nbounded method')
-    V, pol = vfi_bound()    
+    if batch is True:
+        V, pol = vfi_bound_batch(interpmethod = interpmethod)
+    else:
+        V, pol = vfi_bound()    
     print(endogstatevec)
     print(V)
     print(pol)
@@ -99,6 +151,16 @@ def full(nobound = False):
         print(np.max(np.abs(V - V_nobound)))
         print(np.max(np.abs(pol - pol_nobound)))
 
+    if egm is True:
+        print('\nEGM method')
+        V_egm, pol_egm = vfi_egm()
+        print(V_egm)
+        print(pol_egm)
+
+        print('\nLargest difference between bounded and EGM methods')
+        print(np.max(np.abs(V - V_egm)))
+        print(np.max(np.abs(pol - pol_egm)))
+
     # print('\nPolicy Probs (necessary for both transmission array methods')
     sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
     from vfi_1endogstate_func import getpolprobs_1endogstate_continuous
@@ -123,8 +185,19 @@ def full(nobound = False):
     print(endogstatedist)
     print(meansavings)
 
+    print('\nSparse Transmission Array Mean Savings')
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import gentransmissionstararray_1endogstate_continuous_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+    transmissionstararray_sparse = gentransmissionstararray_1endogstate_continuous_sparse(transmissionarray, pol, endogstatevec)
+    fullstatedist_sparse, endogstatedist_sparse = getstationarydist_1endogstate_sparse(transmissionstararray_sparse, len(endogstatevec))
+    meansavings = np.sum(endogstatedist_sparse * endogstatevec)
+    print(endogstatedist_sparse)
+    print(meansavings)
+
     print('\nDifference Distributions')
     print(np.max(np.abs(endogstatedist_standard - endogstatedist)))
+    print(np.max(np.abs(endogstatedist_standard - endogstatedist_sparse)))
 
 
 # Run:{{{1
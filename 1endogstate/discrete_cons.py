@@ -31,19 +31,14 @@ def full():
     Compute VFI for consumption-savings problem.
     """
     ns1 = len(endogstatevec)
-    ns2 = len(exogstatevec)
 
-    rewardarray = np.empty([ns1, ns2, ns1])
-    for s1 in range(ns1):
-        for s2 in range(ns2):
-            for s1prime in range(ns1):
-                
-                C = endogstatevec[s1] * R + exogstatevec[s2] - endogstatevec[s1prime]
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
 
-                if C > 0:
-                    rewardarray[s1, s2, s1prime] = np.log(C)
-                else:
-                    rewardarray[s1, s2, s1prime] = -1e8
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
 
     V, pol = solvevfi_1endogstate_discrete(rewardarray, transmissionarray, beta = BETA, printinfo = True)
     # print(list(V))
@@ -63,6 +58,327 @@ def full():
     # print(list(endogstatedist))
     print(np.sum(endogstatedist * endogstatevec))
 
+    # Solving for transmission array via sparse transmissionstar array
+    # only stores the ns1 * ns2 * ns2 nonzero elements rather than the full (ns1 * ns2) x (ns1 * ns2) matrix
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import gentransmissionstararray_1endogstate_discrete_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+    transmissionstararray_sparse = gentransmissionstararray_1endogstate_discrete_sparse(transmissionarray, pol)
+    fullstatedist, endogstatedist = getstationarydist_1endogstate_sparse(transmissionstararray_sparse, ns1)
+    print('Mean Savings via Sparse Transmission Array')
+    print(np.sum(endogstatedist * endogstatevec))
+
+
+def full_blocks(blocksize = 100):
+    """
+    Solve the same problem without ever creating the full rewardarray.
+    The rewardarray is computed blocksize values of s1 at a time during each iteration so peak memory is O(blocksize * ns1) rather than O(ns1^2 * ns2).
+    Verify this yields exactly the same V and pol as solving with the full rewardarray.
+    """
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from reward_func import getrewardfunction_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    V_full, pol_full = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA)
+    del rewardarray
+
+    rewardfunction = getrewardfunction_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    V, pol = solvevfi_1endogstate_discrete_blocks(rewardfunction, transmissionarray, BETA, ns1 = len(endogstatevec), blocksize = blocksize, printinfo = True)
+
+    if np.any(V != V_full) or np.any(pol != pol_full):
+        raise ValueError('Block solution differs from full rewardarray solution.')
+    else:
+        print('Same')
+
+    return(V, pol)
+
+
+def compare_howard(howardlist = [None, 20, 'solve']):
+    """
+    Compare the time taken to solve VFI with and without Howard improvement steps.
+    howard = k does k cheap policy evaluation sweeps between each maximisation step. howard = 'solve' solves for the value of the current policy function exactly.
+    All methods should yield the same policy function.
+    """
+    import time
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+
+    pollist = []
+    for howard in howardlist:
+        starttime = time.time()
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, howard = howard)
+        print('howard = ' + str(howard) + '. Time: ' + str(time.time() - starttime) + '.')
+        pollist.append(pol)
+
+    for i in range(1, len(pollist)):
+        if np.any(pollist[i] != pollist[0]):
+            raise ValueError('Different policy functions.')
+    print('Same')
+
+
+def compare_search(searchlist = ['brute', 'monotone', 'concave', 'monotone-concave'], validate = False):
+    """
+    Compare the time taken to solve VFI using different methods to find the maximum over s1prime.
+    'monotone' uses that the savings policy function is increasing in current assets. 'concave' uses that the value is concave in savings.
+    validate = True checks every iteration against brute force search (slow - only use with a small ns1).
+    All methods should yield the same policy function.
+    """
+    import time
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+
+    pollist = []
+    for search in searchlist:
+        starttime = time.time()
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, search = search, validate = validate)
+        print('search = ' + search + '. Time: ' + str(time.time() - starttime) + '.')
+        pollist.append(pol)
+
+    for i in range(1, len(pollist)):
+        if np.any(pollist[i] != pollist[0]):
+            raise ValueError('Different policy functions.')
+    print('Same')
+
+
+def compare_stoprule(optionslist = [{}, {'stoprule': 'bounds'}, {'relative': True}, {'stoprule': 'bounds', 'howard': 20}]):
+    """
+    Compare the number of iterations needed with different stopping rules.
+    stoprule = 'bounds' stops on the gap between the MacQueen-Porteus bounds which bounds the error in V (with 'supnorm', the error in V can be up to beta / (1 - beta) times crit). relative = True does relative value iteration.
+    All options should yield the same policy function.
+    """
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    from telemetry_func import getcallback_collector
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+
+    pollist = []
+    for options in optionslist:
+        records, callback = getcallback_collector()
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, callback = callback, **options)
+        print(str(options) + '. Iterations: ' + str(len(records)) + '. Time: ' + str(records[-1]['elapsed_s']) + '.')
+        pollist.append(pol)
+
+    for i in range(1, len(pollist)):
+        if np.any(pollist[i] != pollist[0]):
+            raise ValueError('Different policy functions.')
+    print('Same')
+
+
+def compare_multigrid(ns1list = [100, 400, ns1]):
+    """
+    Solve on grids with ns1 given by ns1list using V from each grid as the initial guess for the next grid and compare with solving on endogstatevec from a cold start.
+    The iterations on the fine grid fall since V from the coarse grid is already close. Both methods should yield the same policy function.
+    """
+    import time
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    from multigrid_func import solvevfi_1endogstate_discrete_multigrid
+    from telemetry_func import getcallback_collector
+
+    starttime = time.time()
+    records, callback = getcallback_collector()
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    V1, pol1 = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, callback = callback)
+    print('Cold start: ' + str(len(records)) + ' iterations in ' + str(time.time() - starttime) + ' seconds.')
+
+    # same spacing as endogstatevec
+    endogstatevec_list = [np.exp(np.linspace(np.log(0.01), np.log(100), thisns1)) for thisns1 in ns1list]
+    starttime = time.time()
+    V2, pol2, levelinfo = solvevfi_1endogstate_discrete_multigrid(budgetfunction, endogstatevec_list, exogstatevec, transmissionarray, BETA, utility = 'log', negvalue = -1e8, printinfo = True)
+    print('Multigrid: ' + str(time.time() - starttime) + ' seconds.')
+
+    if np.any(pol1 != pol2):
+        raise ValueError('Different policy functions.')
+    print('Same')
+
+
+def compare_batchparam(BETAlist = [0.9, 0.93, 0.95], Rlist = [1.02, 1.04, 1.048]):
+    """
+    Solve the model for every combination of BETAlist and Rlist together with solvevfi_1endogstate_discrete_batchparam and compare with solving each model separately.
+    Batching mainly helps when there are many models on small grids since the Python overhead of each iteration is shared by the whole batch.
+    """
+    import time
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_batchparam
+
+    paramlist = [(BETAval, Rval) for BETAval in BETAlist for Rval in Rlist]
+
+    rewardarraylist = []
+    for BETAval, Rval in paramlist:
+        def budgetfunction(endogstate_now, exogstate, endogstate_future):
+            C = endogstate_now * Rval + exogstate - endogstate_future
+            return(C)
+        rewardarraylist.append(getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8))
+    # rewardarray[p, s1, s2, s1prime]
+    rewardarray = np.stack(rewardarraylist)
+    del rewardarraylist
+    betavec = np.array([BETAval for BETAval, Rval in paramlist])
+
+    starttime = time.time()
+    polseparate = []
+    for parami in range(len(paramlist)):
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray[parami], transmissionarray, betavec[parami])
+        polseparate.append(pol)
+    print('Separately. Time: ' + str(time.time() - starttime) + '.')
+
+    starttime = time.time()
+    V, pol = solvevfi_1endogstate_discrete_batchparam(rewardarray, transmissionarray, betavec)
+    print('Batched. Time: ' + str(time.time() - starttime) + '.')
+
+    for parami in range(len(paramlist)):
+        if np.any(pol[parami] != polseparate[parami]):
+            raise ValueError('Different policy functions for (BETA, R) = ' + str(paramlist[parami]) + '.')
+    print('Same')
+
+
+def compare_float32(options = {'stoprule': 'bounds', 'howard': 20}, chunksize = 100):
+    """
+    Solve in float32 (float32 rewardarray, V and continuation value with a compact pol) and compare with the float64 solution.
+    The float32 rewardarray is built in chunks of s1 so the full float64 array is never created and the float64 polishing pass computes its rewards block by block from a rewardfunction.
+    """
+    import time
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from reward_func import getrewardfunction_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    from telemetry_func import getcallback_collector
+
+    starttime = time.time()
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    V64, pol64 = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, **options)
+    print('float64. rewardarray: ' + str(rewardarray.nbytes / 1e6) + 'MB. pol: ' + str(pol64.dtype) + '. Time: ' + str(time.time() - starttime) + '.')
+    del rewardarray
+
+    starttime = time.time()
+    rewardarray32 = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8, chunksize = chunksize, dtype = np.float32)
+    rewardfunction = getrewardfunction_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    records, callback = getcallback_collector()
+    V32, pol32 = solvevfi_1endogstate_discrete_blocks(rewardarray32, transmissionarray, BETA, precision = 'float32', polishsource = rewardfunction, blocksize = chunksize, callback = callback, **options)
+    numfloat32 = len([record for record in records if record['precision'] == 'float32'])
+    print('float32. rewardarray: ' + str(rewardarray32.nbytes / 1e6) + 'MB. pol: ' + str(pol32.dtype) + '. Time: ' + str(time.time() - starttime) + '. Iterations: ' + str(numfloat32) + ' float32 and ' + str(len(records) - numfloat32) + ' float64.')
+
+    if np.any(pol32 != pol64):
+        raise ValueError('Different policy functions at ' + str(np.sum(pol32 != pol64)) + ' states.')
+    print('Same')
+
+
+def compare_memmap(ns1_memmap = 5000, filename = None, options = {'stoprule': 'bounds', 'howard': 20}, reuse = False):
+    """
+    Solve with the rewardarray written to a memory-mapped float32 file and compare with solving with the rewardarray in memory.
+    The solver reads the file in sequential blocks of s1 so the peak memory is far below the size of the file. With reuse = True, running again reuses the file rather than rebuilding it.
+    """
+    import resource
+    import time
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    if filename is None:
+        filename = __projectdir__ / Path('temp/rewardarray_memmap.npy')
+
+    endogstatevec_memmap = np.exp(np.linspace(np.log(0.01), np.log(100), ns1_memmap))
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate_memmap
+    from reward_func import getrewardfunction_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+
+    starttime = time.time()
+    rewardarray = getrewardarray_1endogstate_memmap(budgetfunction, endogstatevec_memmap, exogstatevec, filename, reuse = reuse)
+    print('Memory-mapped rewardarray: ' + str(rewardarray.nbytes / 1e6) + 'MB. Time to build or load: ' + str(time.time() - starttime) + '.')
+
+    starttime = time.time()
+    rewardfunction = getrewardfunction_1endogstate(budgetfunction, endogstatevec_memmap, exogstatevec)
+    V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, precision = 'float32', polishsource = rewardfunction, **options)
+    # ru_maxrss is in kilobytes on Linux
+    print('Memory-mapped solve. Time: ' + str(time.time() - starttime) + '. Peak resident memory so far: ' + str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3) + 'MB.')
+
+    starttime = time.time()
+    V_mem, pol_mem = solvevfi_1endogstate_discrete_blocks(rewardfunction, transmissionarray, BETA, ns1 = ns1_memmap, blocksize = 100, **options)
+    print('Solve computing the rewards in blocks. Time: ' + str(time.time() - starttime) + '.')
+
+    if np.any(pol != pol_mem):
+        raise ValueError('Different policy functions at ' + str(np.sum(pol != pol_mem)) + ' states.')
+    print('Same')
+
+
+def compare_workers(workerslist = None, options = {'howard': 20}):
+    """
+    Compare the time taken to solve VFI with the maximisation over blocks of s1 run on different numbers of threads.
+    By default workerslist is 1, 2, 4, ... up to the number of cores. The speedup is relative to workers = 1 and is limited by the number of cores and the memory bandwidth.
+    V and the policy function should be identical for any number of workers.
+    """
+    import time
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    if workerslist is None:
+        workerslist = [1, 2]
+        while workerslist[-1] * 2 <= os.cpu_count():
+            workerslist.append(workerslist[-1] * 2)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+
+    print('Cores: ' + str(os.cpu_count()) + '.')
+    for workers in workerslist:
+        starttime = time.time()
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, workers = workers, **options)
+        timetaken = time.time() - starttime
+        if workers == workerslist[0]:
+            V0 = V
+            pol0 = pol
+            time0 = timetaken
+        print('workers = ' + str(workers) + '. Time: ' + str(timetaken) + '. Speedup: ' + str(time0 / timetaken) + '.')
+
+        if np.any(pol != pol0) or np.any(V != V0):
+            raise ValueError('Different solutions with workers = ' + str(workers) + '.')
+    print('Same')
+
 
 # Run:{{{1
 full()
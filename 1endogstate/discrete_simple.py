@@ -48,4 +48,18 @@ def oneendogstate_discrete_example():
     print('probs of holiday and work')
     print(endogstatedist)
 
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import gentransmissionstararray_1endogstate_discrete_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+    transmissionstararray_sparse = gentransmissionstararray_1endogstate_discrete_sparse(transmissionarray, pol)
+    fullstatedist, endogstatedist = getstationarydist_1endogstate_sparse(transmissionstararray_sparse, ns1)
+    print('probs of holiday and work using sparse transmission star array')
+    print(endogstatedist)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from simulate_func import simulate_1endogstate
+    simdict = simulate_1endogstate(pol, transmissionarray, np.arange(ns1), 100000, 100, seed = 0)
+    print('probs of holiday and work from simulating 100000 agents for 100 periods')
+    print(simdict['endogstatedist'])
+
 oneendogstate_discrete_example()
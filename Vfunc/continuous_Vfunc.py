@@ -14,11 +14,27 @@ transmissionarray = np.array([[0.9, 0.1], [0.4, 0.6]])
 BETA = 0.95
 R = 1.048
 
-def vfull(functiontype):
+def vfull(functiontype, batch = False, cache = False, cachedir = None):
     """
     Verifying that when I specify, functiontype == 'reward/value-betaEV/value-full' that we get the correct outcomes
     Do this by verifying that these yield the same results when they are specified to be the same
+
+    batch: maximise over every state at once using solvevfi_1endogstate_continuous_batch. The functions are then called with arrays.
+    cache: load V and pol from the on-disk cache in cache_func.py (in cachedir) if the same model has been solved before. The key includes vfull and the solver so editing either solves again.
     """
+    if cache is True:
+        if batch is True:
+            sys.path.append(str(__projectdir__ / Path('func/')))
+            from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+            solver = solvevfi_1endogstate_continuous_batch
+        else:
+            sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+            from vfi_1endogstate_func import solvevfi_1endogstate_continuous
+            solver = solvevfi_1endogstate_continuous
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from cache_func import cachedcall
+        return(cachedcall(vfull, ['V', 'pol'], {'functiontype': functiontype, 'batch': batch}, exact = {'solver': solver}, cachedir = cachedir))
+
 
     def rewardfunction(endogstate_now, exogstate, endogstate_future):
         C = endogstate_now * R + exogstate - endogstate_future
@@ -31,6 +47,10 @@ def vfull(functiontype):
     elif functiontype == 'value-betaEV':
         def inputfunction(betaEVfunc, endogstate_now, exogstate, endogstate_future):
             return(rewardfunction(endogstate_now, exogstate, endogstate_future) + betaEVfunc(endogstate_future))
+    elif functiontype == 'value-full' and batch is True:
+        # Vfunc returns an array [ns1, ns2, ns2prime] so take expectations over the last axis
+        def inputfunction(betaval, Vfunc, nextperiodprobs, endogstate_now, exogstate, endogstate_future):
+            return(rewardfunction(endogstate_now, exogstate, endogstate_future) + BETA * np.sum(Vfunc(endogstate_future) * nextperiodprobs, axis = 2))
     elif functiontype == 'value-full':
         def inputfunction(betaval, Vfunc, nextperiodprobs, endogstate_now, exogstate, endogstate_future):
             return(rewardfunction(endogstate_now, exogstate, endogstate_future) + BETA * Vfunc(endogstate_future).dot(nextperiodprobs))
@@ -44,17 +64,25 @@ def vfull(functiontype):
         return(s1low, s1high)
         
 
-    sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
-    from vfi_1endogstate_func import solvevfi_1endogstate_continuous
-    V, pol = solvevfi_1endogstate_continuous(inputfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = functiontype)
+    if batch is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+        V, pol = solvevfi_1endogstate_continuous_batch(inputfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = functiontype)
+    else:
+        sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+        from vfi_1endogstate_func import solvevfi_1endogstate_continuous
+        V, pol = solvevfi_1endogstate_continuous(inputfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = functiontype)
 
     return(V, pol)
 
 
-def compare():
-    V1, pol1 = vfull('reward')
-    V2, pol2 = vfull('value-betaEV')
-    V3, pol3 = vfull('value-full')
+def compare(batch = False, cache = False, cachedir = None):
+    """
+    cache: reuse the solutions of earlier runs (see vfull)
+    """
+    V1, pol1 = vfull('reward', batch = batch, cache = cache, cachedir = cachedir)
+    V2, pol2 = vfull('value-betaEV', batch = batch, cache = cache, cachedir = cachedir)
+    V3, pol3 = vfull('value-full', batch = batch, cache = cache, cachedir = cachedir)
 
     if np.max(np.abs(V1 - V2)) > 1e-5 or np.max(np.abs(V1 - V3)) > 1e-5:
         print(V1)
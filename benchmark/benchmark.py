@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Measure how the example models scale with the size of the state space.
+
+Each model is solved for a ladder of sizes (ns1, ns2 and T for solveback). For every phase (reward build, vfi, polprobs, stationary distribution) record:
+- time_s: wall time
+- peaktraced_mb: peak memory allocated during the phase (from tracemalloc which also tracks numpy arrays). Only with --tracemalloc (None otherwise).
+- peakrss_mb: peak resident memory of the process by the end of the phase
+- iterations: number of iterations (for the phases that iterate, counted from the records the solvers pass to callback - see func/telemetry_func.py)
+With --telemetry, the per-iteration records are also saved under telemetry in each phase record so convergence can be plotted.
+
+Each (model, size) is run in a fresh process so peakrss_mb is not affected by earlier runs.
+Not every model uses every option (see modeloptions). Each record stores the solveroptions and streamreward the model actually used rather than the options requested.
+tracemalloc slows down every allocation (by several times for code which loops over cells in Python and by about a third for vectorized numpy code) so time_s and peakrss_mb always come from a run without tracemalloc. With --tracemalloc, each (model, size) is run a second time in another fresh process with tracemalloc on and only peaktraced_mb is taken from that run.
+Results are written as one JSON object per line so different solver options can be compared by running with different options and the same or different output files.
+
+Examples:
+./benchmark.py --models discrete aiyagari --output discrete.jsonl
+./benchmark.py --models discrete --search monotone --howard 20 --output discrete_monotone.jsonl
+./benchmark.py --models discrete --workers 4 --output discrete_workers4.jsonl (compare with --workers 1 for the speedup from threads; cpucount is saved in each record)
+./benchmark.py --quick
+./benchmark.py --models discrete --tracemalloc --output discrete_traced.jsonl
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Defaults:{{{1
+BETA = 0.95
+R = 1.048
+
+# ladders of sizes to run for each model
+sizeladders = {
+    'discrete': [{'ns1': ns1, 'ns2': 2} for ns1 in [250, 500, 1000, 2000, 4000]] + [{'ns1': 1000, 'ns2': ns2} for ns2 in [4, 8]],
+    'continuous': [{'ns1': ns1, 'ns2': 2} for ns1 in [50, 100, 200, 400, 800]] + [{'ns1': 100, 'ns2': ns2} for ns2 in [4, 8]],
+    'egm': [{'ns1': ns1, 'ns2': 2} for ns1 in [50, 100, 200, 400, 800, 1600]],
+    'epsteinzin': [{'ns1': ns1, 'ns2': 2} for ns1 in [250, 500, 1000, 2000]],
+    'aiyagari': [{'ns1': ns1, 'ns2': 2} for ns1 in [250, 500, 1000, 2000]],
+    'solveback': [{'ns1': ns1, 'ns2': 2, 'T': T} for ns1 in [100, 300, 1000] for T in [3, 10, 40]],
+}
+quicksizeladders = {
+    'discrete': [{'ns1': ns1, 'ns2': 2} for ns1 in [100, 200]],
+    'continuous': [{'ns1': ns1, 'ns2': 2} for ns1 in [25, 50]],
+    'egm': [{'ns1': ns1, 'ns2': 2} for ns1 in [50, 100]],
+    'epsteinzin': [{'ns1': ns1, 'ns2': 2} for ns1 in [100, 200]],
+    'aiyagari': [{'ns1': ns1, 'ns2': 2} for ns1 in [100, 200]],
+    'solveback': [{'ns1': ns1, 'ns2': 2, 'T': T} for ns1 in [100] for T in [3, 10]],
+}
+
+# Grids:{{{1
+def getgrids(ns1, ns2, s1max = 100):
+    """
+    Log-spaced endogenous grid like the examples.
+    With ns2 = 2, use the exogenous states of discrete_cons.py. Otherwise spread income between 0.01 and 0.1 with persistence 0.9.
+    """
+    endogstatevec = np.exp(np.linspace(np.log(0.01), np.log(s1max), ns1))
+    if ns2 == 2:
+        exogstatevec = np.array([0.01, 0.1])
+        transmissionarray = np.array([[0.9, 0.1], [0.4, 0.6]])
+    else:
+        exogstatevec = np.linspace(0.01, 0.1, ns2)
+        transmissionarray = 0.9 * np.identity(ns2) + 0.1 / ns2 * np.ones([ns2, ns2])
+
+    return(endogstatevec, exogstatevec, transmissionarray)
+
+
+# save the per-iteration records of each phase (set in runcase)
+savetelemetry = False
+
+# Phases:{{{1
+def runphase(records, phase, function, *args, **kwargs):
+    """
+    Run function(*args, **kwargs) and append a record of the time and memory used to records.
+    peaktraced_mb is only recorded if tracemalloc is running (see runcase).
+    If function takes a callback argument, collect its per-iteration records and record the number of iterations.
+    Any output printed by the function is discarded.
+    """
+    import contextlib
+    import inspect
+    import io
+    import resource
+    import time
+    import tracemalloc
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from telemetry_func import getcallback_collector
+
+    iterationrecords, callback = getcallback_collector()
+    if 'callback' in inspect.signature(function).parameters:
+        kwargs['callback'] = callback
+
+    output = io.StringIO()
+    traced = tracemalloc.is_tracing()
+    if traced is True:
+        tracemalloc.reset_peak()
+        tracedstart = tracemalloc.get_traced_memory()[0]
+    starttime = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        result = function(*args, **kwargs)
+    time_s = time.perf_counter() - starttime
+    if traced is True:
+        peaktraced_mb = (tracemalloc.get_traced_memory()[1] - tracedstart) / 1e6
+    else:
+        peaktraced_mb = None
+
+    if len(iterationrecords) == 0:
+        iterations = None
+    else:
+        iterations = len(iterationrecords)
+
+    record = {'phase': phase, 'time_s': time_s, 'peaktraced_mb': peaktraced_mb, 'peakrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3, 'iterations': iterations}
+    if savetelemetry is True:
+        record['telemetry'] = iterationrecords
+    records.append(record)
+
+    return(result)
+
+
+def discretesolve_phases(records, rewardsource, endogstatevec, transmissionarray, beta, solveroptions):
+    """
+    Phases shared by the discrete models: vfi, polprobs (sparse transmission star array) and the stationary distribution.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+    from dist_func import gentransmissionstararray_1endogstate_discrete_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+
+    ns1 = len(endogstatevec)
+
+    V, pol = runphase(records, 'vfi', solvevfi_1endogstate_discrete_blocks, rewardsource, transmissionarray, beta, ns1 = ns1, **solveroptions)
+    transmissionstararray = runphase(records, 'polprobs', gentransmissionstararray_1endogstate_discrete_sparse, transmissionarray, pol)
+    fullstatedist, endogstatedist = runphase(records, 'stationarydist', getstationarydist_1endogstate_sparse, transmissionstararray, ns1)
+
+    return(np.sum(endogstatedist * endogstatevec))
+
+
+# Models:{{{1
+def model_discrete(records, ns1, ns2, solveroptions, streamreward = False):
+    """
+    Consumption-savings problem from discrete_cons.py.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from reward_func import getrewardfunction_1endogstate
+
+    endogstatevec, exogstatevec, transmissionarray = getgrids(ns1, ns2)
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    if streamreward is True:
+        rewardsource = runphase(records, 'rewardbuild', getrewardfunction_1endogstate, budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    else:
+        rewardsource = runphase(records, 'rewardbuild', getrewardarray_1endogstate, budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+
+    return(discretesolve_phases(records, rewardsource, endogstatevec, transmissionarray, BETA, solveroptions))
+
+
+def model_aiyagari(records, ns1, ns2, solveroptions, streamreward = False):
+    """
+    Household problem from aiyagari.py at R close to the equilibrium R.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from reward_func import getrewardfunction_1endogstate
+
+    BETA_aiyagari = 0.8
+    A = 1
+    ALPHA = 0.3
+    DELTA = 0.1
+    R_aiyagari = 1.233
+    W = A * (A / (R_aiyagari - 1 + DELTA)) ** (ALPHA / (1-ALPHA))
+
+    endogstatevec, exogstatevec, transmissionarray = getgrids(ns1, ns2)
+    exogstatevec = exogstatevec / np.mean(exogstatevec)
+    if ns2 == 2:
+        exogstatevec = np.array([0.5, 1.5])
+        transmissionarray = np.array([[0.9, 0.1], [0.1, 0.9]])
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R_aiyagari + W * exogstate - endogstate_future
+        return(C)
+
+    if streamreward is True:
+        rewardsource = runphase(records, 'rewardbuild', getrewardfunction_1endogstate, budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+    else:
+        rewardsource = runphase(records, 'rewardbuild', getrewardarray_1endogstate, budgetfunction, endogstatevec, exogstatevec, utility = 'log', negvalue = -1e8)
+
+    return(discretesolve_phases(records, rewardsource, endogstatevec, transmissionarray, BETA_aiyagari, solveroptions))
+
+
+def model_epsteinzin(records, ns1, ns2, solveroptions, streamreward = False):
+    """
+    Calibration of vfi_epsteinzin_discrete.py solved with the Epstein-Zin mode of the discrete solver.
+    howard = 'solve' is not available with Epstein-Zin preferences so it is replaced by 20 policy evaluation sweeps in getusedoptions.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+
+    BETA_ez = 0.9
+    R_ez = 1.098
+    rra = 2
+    invies = 2
+
+    endogstatevec, exogstatevec, transmissionarray = getgrids(ns1, ns2, s1max = 50)
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        c = endogstate_now * R_ez + exogstate - endogstate_future
+        return(c)
+
+    # reward is g(c) = c^(1 - invies) / (1 - invies)
+    rewardsource = runphase(records, 'rewardbuild', getrewardarray_1endogstate, budgetfunction, endogstatevec, exogstatevec, utility = 'crra', rra = invies, negvalue = -1e8)
+
+    solveroptions = dict(solveroptions)
+    solveroptions['epsteinzin'] = (rra, invies)
+
+    return(discretesolve_phases(records, rewardsource, endogstatevec, transmissionarray, BETA_ez, solveroptions))
+
+
+def model_continuous(records, ns1, ns2, solveroptions, streamreward = False):
+    """
+    Consumption-savings problem from continuous_cons.py solved with the batched continuous solver.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+    from dist_func import gentransmissionstararray_1endogstate_continuous_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+
+    endogstatevec, exogstatevec, transmissionarray = getgrids(ns1, ns2)
+
+    def rewardfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(np.log(C))
+
+    def boundfunction(endogstate_now, exogstate):
+        s1low = None
+        # must save strictly less than all assets today
+        s1high = endogstate_now * R + exogstate - 1e-4
+        return(s1low, s1high)
+
+    V, pol = runphase(records, 'vfi', solvevfi_1endogstate_continuous_batch, rewardfunction, endogstatevec, exogstatevec, transmissionarray, BETA, boundfunction = boundfunction, functiontype = 'reward')
+    transmissionstararray = runphase(records, 'polprobs', gentransmissionstararray_1endogstate_continuous_sparse, transmissionarray, pol, endogstatevec)
+    fullstatedist, endogstatedist = runphase(records, 'stationarydist', getstationarydist_1endogstate_sparse, transmissionstararray, ns1)
+
+    return(np.sum(endogstatedist * endogstatevec))
+
+
+def model_egm(records, ns1, ns2, solveroptions, streamreward = False):
+    """
+    Consumption-savings problem from continuous_cons.py solved with the endogenous grid method.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from egm_func import solveegm_1endogstate
+    from dist_func import gentransmissionstararray_1endogstate_continuous_sparse
+    from dist_func import getstationarydist_1endogstate_sparse
+
+    endogstatevec, exogstatevec, transmissionarray = getgrids(ns1, ns2)
+
+    V, pol = runphase(records, 'vfi', solveegm_1endogstate, np.log, lambda C: 1 / C, lambda margutil: 1 / margutil, endogstatevec, exogstatevec, transmissionarray, BETA, R)
+    transmissionstararray = runphase(records, 'polprobs', gentransmissionstararray_1endogstate_continuous_sparse, transmissionarray, pol, endogstatevec)
+    fullstatedist, endogstatedist = runphase(records, 'stationarydist', getstationarydist_1endogstate_sparse, transmissionstararray, ns1)
+
+    return(np.sum(endogstatedist * endogstatevec))
+
+
+def model_solveback(records, ns1, ns2, solveroptions, streamreward = False, T = 3):
+    """
+    Finite horizon discrete problem from solveback_simple.py::manyperiod_discrete_example with T periods.
+    Solve backwards with vf_solveback_1endogstate_discrete and then move the distribution forwards.
+    Every period after the first shares the same rewardarray so memory does not grow with T.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from solveback_func import vf_solveback_1endogstate_discrete
+    from solveback_func import dist_meanvar_solveback
+
+    endogstate_middleend, exogstatevec, transmissionarray = getgrids(ns1, ns2, s1max = 10)
+    endogstate_list = [np.array([0.0])] + [endogstate_middleend] * (T - 1)
+    exogstate_list = [exogstatevec] * (T - 1) + [np.array([0.0])]
+    transmissionarray_list = [transmissionarray] * (T - 2) + [np.ones([ns2, 1])]
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    def buildrewards():
+        rewardarray_start = getrewardarray_1endogstate(budgetfunction, endogstate_list[0], exogstate_list[0], endogstatevec_future = endogstate_list[1], utility = 'log', negvalue = -1e90)
+        rewardarray_middle = getrewardarray_1endogstate(budgetfunction, endogstate_middleend, exogstatevec, endogstatevec_future = endogstate_middleend, utility = 'log', negvalue = -1e90)
+        return([rewardarray_start] + [rewardarray_middle] * (T - 2))
+
+    def solveback(rewardarray_list, callback = None):
+        Vprime = np.log(endogstate_list[-1][:, np.newaxis] + exogstate_list[-1][np.newaxis, :])
+        Vlist, pollist = vf_solveback_1endogstate_discrete(rewardarray_list, Vprime, transmissionarray_list, BETA, T, callback = callback, workers = solveroptions.get('workers'))
+        return(pollist)
+
+    def distforward(pollist):
+        meanlist, varlist = dist_meanvar_solveback([1], np.ones(ns2) / ns2, endogstate_list, transmissionarray_list, pollist)
+        return(meanlist)
+
+    rewardarray_list = runphase(records, 'rewardbuild', buildrewards)
+    pollist = runphase(records, 'vfi', solveback, rewardarray_list)
+    meanlist = runphase(records, 'dist', distforward, pollist)
+
+    return(meanlist[-1])
+
+
+models = {'discrete': model_discrete, 'continuous': model_continuous, 'egm': model_egm, 'epsteinzin': model_epsteinzin, 'aiyagari': model_aiyagari, 'solveback': model_solveback}
+# solveroptions (and streamreward) used by each model - the others are ignored by the model
+modeloptions = {
+    'discrete': ['blocksize', 'search', 'howard', 'workers', 'streamreward'],
+    'aiyagari': ['blocksize', 'search', 'howard', 'workers', 'streamreward'],
+    'epsteinzin': ['blocksize', 'search', 'howard', 'workers'],
+    'continuous': [],
+    'egm': [],
+    'solveback': ['workers'],
+}
+
+def getusedoptions(modelname, solveroptions, streamreward):
+    """
+    Return the solveroptions and streamreward that modelname actually uses so the records of a model are not labelled with options it ignores.
+    """
+    usedoptions = {name: solveroptions[name] for name in solveroptions if name in modeloptions[modelname]}
+    if modelname == 'epsteinzin' and usedoptions.get('howard') == 'solve':
+        usedoptions['howard'] = 20
+    usedstreamreward = streamreward is True and 'streamreward' in modeloptions[modelname]
+
+    return(usedoptions, usedstreamreward)
+
+
+# Run:{{{1
+def runcase(modelname, size, solveroptions, streamreward, telemetry = False, traced = False):
+    """
+    Run one model at one size. Called in a fresh process.
+    traced: run with tracemalloc on (only use the run for peaktraced_mb since tracemalloc distorts the times)
+    """
+    import time
+    import tracemalloc
+
+    global savetelemetry
+    savetelemetry = telemetry
+
+    # import scipy before the timing starts so the import is not counted in the first phase that uses it
+    import scipy.sparse
+    import scipy.sparse.linalg
+
+    solveroptions, streamreward = getusedoptions(modelname, solveroptions, streamreward)
+
+    if traced is True:
+        tracemalloc.start()
+    records = []
+    starttime = time.perf_counter()
+    sizeoptions = {'T': size['T']} if 'T' in size else {}
+    models[modelname](records, size['ns1'], size['ns2'], solveroptions, streamreward = streamreward, **sizeoptions)
+    totaltime = time.perf_counter() - starttime
+    if traced is True:
+        tracemalloc.stop()
+        peaktraced_mb = max(record['peaktraced_mb'] for record in records)
+    else:
+        peaktraced_mb = None
+
+    records.append({'phase': 'total', 'time_s': totaltime, 'peaktraced_mb': peaktraced_mb, 'peakrss_mb': max(record['peakrss_mb'] for record in records), 'iterations': None})
+    for record in records:
+        record.update({'model': modelname, 'ns1': size['ns1'], 'ns2': size['ns2'], 'T': size.get('T'), 'solveroptions': solveroptions, 'streamreward': streamreward, 'cpucount': os.cpu_count()})
+
+    return(records)
+
+
+def runcase_freshprocess(*args, **kwargs):
+    """
+    Run runcase in a fresh process.
+    """
+    import concurrent.futures
+    import multiprocessing
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn')) as executor:
+        return(executor.submit(runcase, *args, **kwargs).result())
+
+
+def runbenchmark(modelnames = None, output = None, solveroptions = {}, streamreward = False, quick = False, maxseconds = 600, telemetry = False, traced = False):
+    """
+    Run the ladder of sizes for each model and write the results to output (JSON lines).
+    Stop increasing the size of a model once one case takes more than maxseconds.
+    traced: also run each case with tracemalloc on to get peaktraced_mb (the times always come from the run without tracemalloc)
+    """
+    import json
+
+    if modelnames is None:
+        modelnames = list(models)
+    if quick is True:
+        ladders = quicksizeladders
+    else:
+        ladders = sizeladders
+
+    allrecords = []
+    for modelname in modelnames:
+        usedoptions, usedstreamreward = getusedoptions(modelname, solveroptions, streamreward)
+        ignored = [name for name in solveroptions if name not in usedoptions] + (['streamreward'] if streamreward is True and usedstreamreward is False else [])
+        if len(ignored) > 0:
+            print('Model ' + modelname + ' ignores ' + ', '.join(ignored) + '.')
+        for size in ladders[modelname]:
+            records = runcase_freshprocess(modelname, size, solveroptions, streamreward, telemetry = telemetry)
+            if traced is True:
+                # the phases are run in the same order in both runs
+                tracedrecords = runcase_freshprocess(modelname, size, solveroptions, streamreward, traced = True)
+                for record, tracedrecord in zip(records, tracedrecords):
+                    record['peaktraced_mb'] = tracedrecord['peaktraced_mb']
+            allrecords = allrecords + records
+
+            if output is not None:
+                with open(output, 'a') as f:
+                    for record in records:
+                        f.write(json.dumps(record) + '\n')
+
+            for record in records:
+                print(modelname + ' ' + str(size) + ' ' + record['phase'] + ': ' + '{:.3f}'.format(record['time_s']) + 's, peak traced ' + ('-' if record['peaktraced_mb'] is None else '{:.1f}'.format(record['peaktraced_mb']) + 'MB') + ', peak rss ' + '{:.1f}'.format(record['peakrss_mb']) + 'MB, iterations ' + str(record['iterations']))
+
+            if records[-1]['time_s'] > maxseconds:
+                print('Stopping ' + modelname + ' since the last case took more than ' + str(maxseconds) + ' seconds.')
+                break
+
+    return(allrecords)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', nargs = '+', choices = list(models), help = 'models to run (default: all)')
+    parser.add_argument('--output', help = 'JSON lines file to append results to')
+    parser.add_argument('--quick', action = 'store_true', help = 'only run small sizes')
+    parser.add_argument('--maxseconds', type = float, default = 600, help = 'stop increasing the size of a model once a case takes longer than this')
+    parser.add_argument('--streamreward', action = 'store_true', help = 'never build the full rewardarray for the discrete models')
+    parser.add_argument('--telemetry', action = 'store_true', help = 'save the per-iteration records of each phase in the output')
+    parser.add_argument('--tracemalloc', action = 'store_true', help = 'also run each case with tracemalloc to record peaktraced_mb (times are from the run without tracemalloc)')
+    # options for solvevfi_1endogstate_discrete_blocks
+    parser.add_argument('--blocksize', type = int)
+    parser.add_argument('--search', choices = ['brute', 'monotone', 'concave', 'monotone-concave'])
+    parser.add_argument('--howard', help = 'integer number of policy evaluation sweeps or solve')
+    parser.add_argument('--workers', type = int, help = 'number of threads in each maximisation step')
+    args = parser.parse_args()
+
+    solveroptions = {}
+    if args.blocksize is not None:
+        solveroptions['blocksize'] = args.blocksize
+    if args.search is not None:
+        solveroptions['search'] = args.search
+    if args.workers is not None:
+        solveroptions['workers'] = args.workers
+    if args.howard is not None:
+        if args.howard == 'solve':
+            solveroptions['howard'] = 'solve'
+        else:
+            solveroptions['howard'] = int(args.howard)
+
+    runbenchmark(modelnames = args.models, output = args.output, solveroptions = solveroptions, streamreward = args.streamreward, quick = args.quick, maxseconds = args.maxseconds, telemetry = args.telemetry, traced = args.tracemalloc)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,12 @@ import numpy as np
 BETA = 0.95
 R = 1.048
 
-def example_epsteinzin_singleiteration(crra = False):
+def example_epsteinzin_singleiteration(crra = False, cached = False):
     """
     Basic idea of example considered here:
 
     crra is True allows me to compare with CRRA case
+    cached is True uses vf_1endogstate_continuous_oneiteration_batch with functiontype = 'value-CE' so the certainty equivalent is computed once rather than interpolating Vprime for every exogenous state in each evaluation
     """
     
     rra = 2
@@ -52,6 +53,13 @@ def example_epsteinzin_singleiteration(crra = False):
         def inputfunction(s1val, s2val, s1val_new):
             c = s1val + s2val - s1val_new
             return(c**(1-rra)/(1-rra))
+    elif cached is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from epsteinzin_vec_func import vf_epsteinzin_vec
+
+        def inputfunction(BETA, CEfunc, s1val, s2val, s1val_new):
+            c = s1val + s2val - s1val_new
+            return(vf_epsteinzin_vec(c, CEfunc(s1val_new), BETA, invies))
     else:
         def inputfunction(BETA, Vfunc, nextperiodprobs, s1val, s2val, s1val_new):
             c = s1val + s2val - s1val_new
@@ -71,12 +79,19 @@ def example_epsteinzin_singleiteration(crra = False):
 
     if crra is True:
         functiontype = 'reward'
+    elif cached is True:
+        functiontype = 'value-CE'
     else:
         functiontype = 'value-full'
 
-    sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
-    from vf_solveback_1endogstate_func import vf_1endogstate_continuous_oneiteration
-    V, pol = vf_1endogstate_continuous_oneiteration(inputfunction, Vprime, endogstates_now, endogstates_future, exogstates_now, exogstates_future, transmissionarray, BETA, functiontype = functiontype, boundfunction = boundfunction)
+    if cached is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from vfi_continuous_func import vf_1endogstate_continuous_oneiteration_batch
+        V, pol = vf_1endogstate_continuous_oneiteration_batch(inputfunction, Vprime, endogstates_now, endogstates_future, exogstates_now, exogstates_future, transmissionarray, BETA, functiontype = functiontype, boundfunction = boundfunction, rra = rra)
+    else:
+        sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+        from vf_solveback_1endogstate_func import vf_1endogstate_continuous_oneiteration
+        V, pol = vf_1endogstate_continuous_oneiteration(inputfunction, Vprime, endogstates_now, endogstates_future, exogstates_now, exogstates_future, transmissionarray, BETA, functiontype = functiontype, boundfunction = boundfunction)
 
     print('pol:')
     print(pol)
@@ -88,3 +103,5 @@ print('CRRA:')
 example_epsteinzin_singleiteration(crra = True)
 print('\n NOT CRRA:')
 example_epsteinzin_singleiteration(crra = False)
+print('\n NOT CRRA (cached certainty equivalent):')
+example_epsteinzin_singleiteration(crra = False, cached = True)
@@ -20,12 +20,26 @@ R = 1.098
 rra = 2
 invies = 2
 
-def example_epsteinzin_singleiteration(crra = False):
+def example_epsteinzin_singleiteration(crra = False, batch = False, cache = False, cachedir = None):
     """
     Basic idea of example considered here:
 
     crra is True allows me to compare with CRRA case
+    batch is True uses solvevfi_1endogstate_continuous_batch. In the Epstein-Zin case this uses functiontype = 'value-CE' so the certainty equivalent is computed once per iteration and each evaluation only needs one interpolation.
+    cache: load V and pol from the on-disk cache in cache_func.py (in cachedir) if the same model has been solved before (for example the CRRA baseline). The key includes this function and the solver so editing either solves again.
     """
+    if cache is True:
+        if batch is True:
+            sys.path.append(str(__projectdir__ / Path('func/')))
+            from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+            solver = solvevfi_1endogstate_continuous_batch
+        else:
+            sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+            from vfi_1endogstate_func import solvevfi_1endogstate_continuous
+            solver = solvevfi_1endogstate_continuous
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from cache_func import cachedcall
+        return(cachedcall(example_epsteinzin_singleiteration, ['V', 'pol'], {'crra': crra, 'batch': batch}, exact = {'solver': solver}, cachedir = cachedir))
 
 
     def boundfunction(endogstate_now, exogstate):
@@ -39,6 +53,13 @@ def example_epsteinzin_singleiteration(crra = False):
         def inputfunction(betaEV, s1val, s2val, s1val_new):
             c = s1val * R + s2val - s1val_new
             return(c**(1-rra)/(1-rra) + betaEV(s1val_new))
+    elif batch is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from epsteinzin_vec_func import vf_epsteinzin_vec
+
+        def inputfunction(BETA, CEfunc, s1val, s2val, s1val_new):
+            c = s1val * R + s2val - s1val_new
+            return(vf_epsteinzin_vec(c, CEfunc(s1val_new), BETA, invies))
     else:
         def inputfunction(BETA, Vfunc, nextperiodprobs, s1val, s2val, s1val_new):
             c = s1val * R + s2val - s1val_new
@@ -52,19 +73,29 @@ def example_epsteinzin_singleiteration(crra = False):
 
     if crra is True:
         functiontype = 'value-betaEV'
+    elif batch is True:
+        functiontype = 'value-CE'
     else:
         functiontype = 'value-full'
 
-    sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
-    from vfi_1endogstate_func import solvevfi_1endogstate_continuous
-    V, pol = solvevfi_1endogstate_continuous(inputfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = functiontype, interpmethod = 'numpy')
+    if batch is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+        V, pol = solvevfi_1endogstate_continuous_batch(inputfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = functiontype, rra = rra)
+    else:
+        sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+        from vfi_1endogstate_func import solvevfi_1endogstate_continuous
+        V, pol = solvevfi_1endogstate_continuous(inputfunction, endogstatevec, exogstatevec, transmissionarray, BETA, printinfo = True, boundfunction = boundfunction, functiontype = functiontype, interpmethod = 'numpy')
 
     return(V, pol)
 
 
-def compare():
-    V1, pol1 = example_epsteinzin_singleiteration(crra = False)
-    V2, pol2 = example_epsteinzin_singleiteration(crra = True)
+def compare(batch = False, cache = False, cachedir = None):
+    """
+    cache: reuse the solutions of earlier runs (see example_epsteinzin_singleiteration)
+    """
+    V1, pol1 = example_epsteinzin_singleiteration(crra = False, batch = batch, cache = cache, cachedir = cachedir)
+    V2, pol2 = example_epsteinzin_singleiteration(crra = True, batch = batch, cache = cache, cachedir = cachedir)
 
     if np.max(np.abs(pol1 - pol2)) > 1e-8:
         print(pol1)
@@ -19,31 +19,49 @@ R = 1.098
 rra = 2
 invies = 2
 
-def example_epsteinzin_singleiteration(crra = False):
+def example_epsteinzin_singleiteration(crra = False, vectorized = True, cache = False, cachedir = None):
     """
     Basic idea of example considered here:
 
     crra is True allows me to compare with CRRA case
+    vectorized is True uses the Epstein-Zin mode of solvevfi_1endogstate_discrete_blocks which computes the certainty equivalent as an array rather than calling the Epstein-Zin value function for every (s1, s2, s1prime)
+    cache: load V and pol from the on-disk cache in cache_func.py (in cachedir) if the same model has been solved before (for example the CRRA baseline). The key includes this function and the solver so editing either solves again.
     """
-    ns1 = len(endogstatevec)
-    ns2 = len(exogstatevec)
-
-    rewardarray = np.empty([ns1, ns2, ns1])
-    for s1 in range(ns1):
-        for s2 in range(ns2):
-            for s1prime in range(ns1):
-                c = endogstatevec[s1] * R + exogstatevec[s2] - endogstatevec[s1prime]
-                if crra is True:
-                    # in the crra case we don't need an input function
-                    # rewardarray is just u(c) like normal
-                    if c > 0:
-                        rewardarray[s1, s2, s1prime] = c ** (1 - rra) / (1 - rra)
-                    else:
-                        rewardarray[s1, s2, s1prime] = -1e8
-                else:
-                    # in this case we just set the rewardarray to be c
-                    # we'll then input this c into the epstein zin value function later
-                    rewardarray[s1, s2, s1prime] = c
+    if cache is True:
+        if crra is False and vectorized is True:
+            sys.path.append(str(__projectdir__ / Path('func/')))
+            from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+            solver = solvevfi_1endogstate_discrete_blocks
+        else:
+            sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+            from vfi_1endogstate_func import solvevfi_1endogstate_discrete
+            solver = solvevfi_1endogstate_discrete
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from cache_func import cachedcall
+        return(cachedcall(example_epsteinzin_singleiteration, ['V', 'pol'], {'crra': crra, 'vectorized': vectorized}, exact = {'solver': solver}, cachedir = cachedir))
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        c = endogstate_now * R + exogstate - endogstate_future
+        return(c)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    if crra is True:
+        # in the crra case we don't need an input function
+        # rewardarray is just u(c) like normal
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'crra', rra = rra, negvalue = -1e8)
+    elif vectorized is True:
+        # rewardarray is g(c) = c^(1 - invies) / (1 - invies)
+        # the solver adds beta / (1 - beta) * g(CE) and converts back into V after maximising
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'crra', rra = invies, negvalue = -1e8)
+    else:
+        # in this case we just set the rewardarray to be c
+        # we'll then input this c into the epstein zin value function later
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = 'c')
+
+    if crra is False and vectorized is True:
+        from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+        V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, BETA, printinfo = True, epsteinzin = (rra, invies))
+        return(V, pol)
 
     if crra is True:
         Vfunc = None
@@ -65,9 +83,12 @@ def example_epsteinzin_singleiteration(crra = False):
     return(V, pol)
 
 
-def compare():
-    V1, pol1 = example_epsteinzin_singleiteration(crra = False)
-    V2, pol2 = example_epsteinzin_singleiteration(crra = True)
+def compare(cache = False, cachedir = None):
+    """
+    cache: reuse the solutions of earlier runs (see example_epsteinzin_singleiteration)
+    """
+    V1, pol1 = example_epsteinzin_singleiteration(crra = False, cache = cache, cachedir = cachedir)
+    V2, pol2 = example_epsteinzin_singleiteration(crra = True, cache = cache, cachedir = cachedir)
 
     print(list(np.column_stack([pol1, pol2])))
     if np.max(np.abs(pol1 - pol2)) > 1e-8:
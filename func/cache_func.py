@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of solutions (V, pol, polprobs, stationary distributions etc.) so the same model is not solved twice.
+
+Each entry is a .npz file of arrays with a .json file giving the numeric parameters it was solved at and when it was last used.
+Entries are identified by:
+- exact: everything that must match exactly (grids, transmission array, solver options, the reward source etc.)
+- params: dict of numeric parameters (for example {'R': 1.02}). A lookup with the same exact inputs but different params can return the cached solution with the closest params as a warm start (a near miss).
+The key is a hash of exact and params. Arrays are hashed by their dtype, shape and contents. Real numbers are hashed as floats so R = 1.05 and R = np.float64(1.05) give the same key. Functions are hashed by their bytecode, constants (including nested functions and lambdas), default arguments, closure variables and the globals they use: numbers, strings, arrays, lists/tuples/dicts and other functions (recursively) so a budgetfunction using a module-level R, a module-level exogstatevec list, a default argument R = R or a helper function changes key when they change. Globals which cannot be hashed raise an error. Modules (numpy etc.) are not hashed so the hash of a function is not a proof that two functions give the same results.
+
+The cache is bounded by maxbytes: after saving an entry, the least recently used entries are removed until the total size of the .npz files is below maxbytes.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Defaults:{{{1
+defaultcachedir = __projectdir__ / Path('temp/cache/')
+defaultmaxbytes = 1e9
+
+# Hashing:{{{1
+def getcodenames(code):
+    """
+    Return the sorted names used by code and by every function or lambda defined within it (the globals it may use).
+    """
+    import types
+
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names = names | set(getcodenames(const))
+    return(sorted(names))
+
+
+def updatehash(hasher, obj, visited = None):
+    """
+    Add obj to the hashlib object hasher. Works recursively for dicts, lists and tuples.
+    Real numbers are hashed as floats so 1, 1.0 and np.float64(1.0) give the same hash.
+    Functions are hashed with everything they use as globals: numbers, strings, arrays, lists/tuples/dicts and other functions (recursively - visited is the set of functions already being hashed). Modules are skipped and classes and builtins are hashed by name. Other globals raise an error rather than being skipped.
+    """
+    import numbers
+    import types
+
+    if visited is None:
+        visited = set()
+
+    if obj is None or isinstance(obj, (bool, np.bool_, str)):
+        hasher.update((type(obj).__name__ + ':' + repr(obj)).encode())
+    elif isinstance(obj, numbers.Real):
+        hasher.update(('float:' + repr(float(obj))).encode())
+    elif isinstance(obj, (np.generic, np.dtype, os.PathLike)):
+        hasher.update((type(obj).__name__ + ':' + str(obj)).encode())
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(('list' + str(len(obj))).encode())
+        for item in obj:
+            updatehash(hasher, item, visited)
+    elif isinstance(obj, dict):
+        hasher.update(('dict' + str(len(obj))).encode())
+        for name in sorted(obj):
+            updatehash(hasher, name, visited)
+            updatehash(hasher, obj[name], visited)
+    elif isinstance(obj, np.ndarray) or hasattr(obj, 'toarray'):
+        if hasattr(obj, 'toarray'):
+            # scipy.sparse
+            obj = obj.toarray()
+        obj = np.ascontiguousarray(obj)
+        hasher.update(('array' + str(obj.dtype) + str(obj.shape)).encode())
+        hasher.update(obj.tobytes())
+    elif isinstance(obj, types.CodeType):
+        # nested functions and lambdas appear as code objects in co_consts
+        hasher.update(('code' + obj.co_name).encode())
+        hasher.update(obj.co_code)
+        updatehash(hasher, list(obj.co_consts), visited)
+        updatehash(hasher, list(obj.co_names), visited)
+    elif isinstance(obj, types.FunctionType):
+        code = obj.__code__
+        hasher.update(('function' + code.co_name).encode())
+        if id(obj) in visited:
+            # recursive or mutually recursive functions
+            return(None)
+        visited.add(id(obj))
+        updatehash(hasher, code, visited)
+        updatehash(hasher, obj.__defaults__, visited)
+        updatehash(hasher, obj.__kwdefaults__, visited)
+        if obj.__closure__ is not None:
+            updatehash(hasher, [cell.cell_contents for cell in obj.__closure__], visited)
+        for name in getcodenames(code):
+            if name not in obj.__globals__ or isinstance(obj.__globals__[name], types.ModuleType):
+                continue
+            updatehash(hasher, name, visited)
+            try:
+                updatehash(hasher, obj.__globals__[name], visited)
+            except ValueError:
+                raise ValueError('Cannot hash the global ' + name + ' used by ' + code.co_name + ' (type ' + str(type(obj.__globals__[name])) + '). Add what it depends upon to exact instead.')
+    elif callable(obj):
+        # builtins, classes or numpy functions
+        hasher.update(('callable' + getattr(obj, '__module__', '') + '.' + getattr(obj, '__name__', repr(obj))).encode())
+    else:
+        raise ValueError('Cannot hash object of type ' + str(type(obj)) + '.')
+
+
+def gethash(obj):
+    """
+    Return a hex digest of obj (see updatehash).
+    """
+    import hashlib
+
+    hasher = hashlib.sha256()
+    updatehash(hasher, obj)
+    return(hasher.hexdigest())
+
+
+def getcachekeys(exact, params = None):
+    """
+    Return the key of the entry and the group key shared by all entries with the same exact inputs and parameter names (used for near misses).
+    """
+    if params is None:
+        params = {}
+    key = gethash([exact, params])
+    group = gethash([exact, sorted(params)])
+
+    return(key, group)
+
+
+# Load/Save:{{{1
+def loadcache(exact, params = None, cachedir = None):
+    """
+    Return the dict of arrays saved under exact and params or None if there is no entry.
+    """
+    import time
+
+    if cachedir is None:
+        cachedir = defaultcachedir
+    key, group = getcachekeys(exact, params)
+    filename = Path(cachedir) / Path(key + '.npz')
+    if not os.path.isfile(filename):
+        return(None)
+
+    with np.load(filename) as f:
+        arrays = {name: f[name] for name in f.files}
+    # record the use for the LRU eviction
+    os.utime(filename, (time.time(), time.time()))
+
+    return(arrays)
+
+
+def loadcache_nearest(exact, params, cachedir = None):
+    """
+    Return the dict of arrays and the params of the entry with the same exact inputs whose params are closest to params (in relative terms) or (None, None) if there is no such entry.
+    """
+    import json
+    import time
+
+    if cachedir is None:
+        cachedir = defaultcachedir
+    key, group = getcachekeys(exact, params)
+    if not os.path.isdir(cachedir):
+        return(None, None)
+
+    best = None
+    for jsonname in os.listdir(cachedir):
+        if not jsonname.endswith('.json'):
+            continue
+        try:
+            with open(Path(cachedir) / Path(jsonname)) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if info['group'] != group or not os.path.isfile(Path(cachedir) / Path(info['key'] + '.npz')):
+            continue
+        distance = np.sqrt(np.sum([((info['params'][name] - params[name]) / max(abs(params[name]), 1e-12)) ** 2 for name in params]))
+        if best is None or distance < best[0]:
+            best = (distance, info)
+
+    if best is None:
+        return(None, None)
+
+    filename = Path(cachedir) / Path(best[1]['key'] + '.npz')
+    with np.load(filename) as f:
+        arrays = {name: f[name] for name in f.files}
+    os.utime(filename, (time.time(), time.time()))
+
+    return(arrays, best[1]['params'])
+
+
+def savecache(arrays, exact, params = None, cachedir = None, maxbytes = None):
+    """
+    Save the dict of arrays under exact and params and then evict the least recently used entries until the cache is below maxbytes.
+    """
+    import json
+
+    if cachedir is None:
+        cachedir = defaultcachedir
+    if maxbytes is None:
+        maxbytes = defaultmaxbytes
+    if params is None:
+        params = {}
+    key, group = getcachekeys(exact, params)
+
+    if not os.path.isdir(cachedir):
+        os.makedirs(cachedir)
+
+    # write to a temporary file and rename so a partly written file is never loaded
+    tempname = Path(cachedir) / Path(key + '.tmp.npz')
+    np.savez(tempname, **arrays)
+    os.replace(tempname, Path(cachedir) / Path(key + '.npz'))
+    with open(Path(cachedir) / Path(key + '.json'), 'w') as f:
+        json.dump({'key': key, 'group': group, 'params': {name: float(params[name]) for name in params}}, f)
+
+    evictcache(cachedir, maxbytes)
+
+
+def evictcache(cachedir = None, maxbytes = None):
+    """
+    Delete the least recently used entries until the total size of the .npz files in cachedir is at most maxbytes.
+    """
+    if cachedir is None:
+        cachedir = defaultcachedir
+    if maxbytes is None:
+        maxbytes = defaultmaxbytes
+
+    entries = []
+    for filename in os.listdir(cachedir):
+        if filename.endswith('.npz') and not filename.endswith('.tmp.npz'):
+            stat = os.stat(Path(cachedir) / Path(filename))
+            entries.append((stat.st_mtime, stat.st_size, filename[: -len('.npz')]))
+
+    totalbytes = sum(entry[1] for entry in entries)
+    for mtime, size, key in sorted(entries):
+        if totalbytes <= maxbytes:
+            break
+        for suffix in ['.npz', '.json']:
+            if os.path.isfile(Path(cachedir) / Path(key + suffix)):
+                os.remove(Path(cachedir) / Path(key + suffix))
+        totalbytes = totalbytes - size
+
+
+# Cached Solve:{{{1
+def cachedsolve(solvefunction, exact, params = None, cachedir = None, maxbytes = None, nearest = True, printinfo = False):
+    """
+    Return the cached dict of arrays for exact and params if it exists. Otherwise call solvefunction(warmstart) which should return a dict of arrays, save the result and return it.
+    warmstart is the dict of arrays of the closest cached params if nearest is True and such an entry exists and None otherwise.
+    """
+    arrays = loadcache(exact, params, cachedir = cachedir)
+    if arrays is not None:
+        if printinfo is True:
+            print('Loaded from cache.')
+        return(arrays)
+
+    warmstart = None
+    if nearest is True and params is not None and len(params) > 0:
+        warmstart, warmparams = loadcache_nearest(exact, params, cachedir = cachedir)
+        if printinfo is True and warmstart is not None:
+            print('Warm start from cached solution at ' + str(warmparams) + '.')
+
+    arrays = solvefunction(warmstart)
+    savecache(arrays, exact, params, cachedir = cachedir, maxbytes = maxbytes)
+
+    return(arrays)
+
+
+def cachedcall(function, arraynames, kwargs = None, exact = None, cachedir = None, maxbytes = None, printinfo = False):
+    """
+    Return function(**kwargs) (a tuple of arrays named arraynames, for example V and pol) from the cache if it has been called before with the same kwargs. Otherwise call it and save the result.
+    The key includes function itself (with the functions and globals it uses - see updatehash) and exact (for example the solver it imports).
+    """
+    if kwargs is None:
+        kwargs = {}
+
+    def solvefunction(warmstart):
+        return(dict(zip(arraynames, function(**kwargs))))
+
+    arrays = cachedsolve(solvefunction, {'function': function, 'kwargs': kwargs, 'exact': exact}, cachedir = cachedir, maxbytes = maxbytes, nearest = False, printinfo = printinfo)
+
+    return(tuple(arrays[name] for name in arraynames))
+
+
+# Compare:{{{1
+def compare():
+    """
+    Check that functions which only differ in a default argument, a nested function, a global list or a global helper function get different keys and that equal real numbers get the same key.
+    """
+    R0 = 1.02
+    R1 = 1.05
+    functionpairs = [
+        (lambda a, y, ap, R = R0: a * R + y - ap, lambda a, y, ap, R = R1: a * R + y - ap),
+        (lambda a, y, ap, *, R = R0: a * R + y - ap, lambda a, y, ap, *, R = R1: a * R + y - ap),
+        (lambda a, y, ap: (lambda x: x * 1.02)(a) + y - ap, lambda a, y, ap: (lambda x: x * 1.05)(a) + y - ap),
+        ]
+
+    for i in range(len(functionpairs)):
+        if gethash(functionpairs[i][0]) == gethash(functionpairs[i][1]):
+            raise ValueError('Functions with different R have the same hash: ' + str(i) + '.')
+        if gethash(functionpairs[i][0]) != gethash(functionpairs[i][0]):
+            raise ValueError('Hash of a function is not deterministic.')
+
+    # globals: a list and a helper function
+    namespace = {'exogstatevec': [0.01, 0.1]}
+    exec('def getincome(s2):\n    return(exogstatevec[s2])\ndef budgetfunction(a, s2, ap):\n    return(a * 1.05 + getincome(s2) - ap)', namespace)
+    hashes = [gethash(namespace['budgetfunction'])]
+    namespace['exogstatevec'] = [0.01, 0.2]
+    hashes.append(gethash(namespace['budgetfunction']))
+    exec('def getincome(s2):\n    return(2 * exogstatevec[s2])', namespace)
+    hashes.append(gethash(namespace['budgetfunction']))
+    if len(set(hashes)) != 3:
+        raise ValueError('Changing a global list or a global helper function does not change the hash.')
+
+    # real numbers
+    if gethash({'R': 1.05}) != gethash({'R': np.float64(1.05)}) or gethash(1) != gethash(1.0):
+        raise ValueError('Equal real numbers have different hashes.')
+    print('Same')
+
+
+# Run:{{{1
+if __name__ == "__main__":
+    compare()
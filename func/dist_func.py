@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Stationary distributions over (s1, s2) given a policy function.
+
+Unlike getstationarydist_1endogstate_full/getstationarydist_1endogstate_direct in vfi-general, these functions take an initial guess of the distribution so that a solve can be warm started from the distribution of a similar problem.
+fullstatedist has shape [ns1, ns2] and endogstatedist has shape [ns1].
+
+The sparse transmission star arrays have the same role as gentransmissionstararray_1endogstate_discrete/gentransmissionstararray_1endogstate_polprobs in vfi-general but are stored as scipy.sparse CSR matrices so memory is proportional to the ns1 * ns2 * ns2prime nonzero elements rather than (ns1 * ns2)^2.
+Rows and columns are ordered s1 * ns2 + s2 and row (s1, s2) gives the probabilities of moving from (s1, s2) to each (s1prime, s2prime).
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Continuous Policy:{{{1
+def getpolweights_1endogstate_continuous(pol, endogstatevec):
+    """
+    Represent a continuous policy function pol[s1, s2] (values of s1prime) as a lottery over the two adjacent points of endogstatevec.
+    Returns lowerindex[s1, s2] and lowerweight[s1, s2] such that the agent moves to endogstatevec[lowerindex] with probability lowerweight and to endogstatevec[lowerindex + 1] with probability 1 - lowerweight.
+    This preserves the mean of s1prime when pol lies within endogstatevec. pol outside endogstatevec is set to the nearest end point.
+    """
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+    ns1prime = len(endogstatevec)
+
+    lowerindex = np.clip(np.searchsorted(endogstatevec, pol, side = 'right') - 1, 0, ns1prime - 2)
+    lowerweight = (endogstatevec[lowerindex + 1] - pol) / (endogstatevec[lowerindex + 1] - endogstatevec[lowerindex])
+    lowerweight = np.clip(lowerweight, 0, 1)
+
+    return(lowerindex, lowerweight)
+
+
+# Sparse Transmission Star Array:{{{1
+def gentransmissionstararray_1endogstate_sparse(transmissionarray, polindex, polweight = None, ns1prime = None):
+    """
+    Build the sparse transmission star array when (s1, s2) moves to polindex[s1, s2, i] with probability polweight[s1, s2, i].
+    polindex and polweight can also have shape [ns1, ns2] if each state moves to a single s1prime.
+    """
+    import scipy.sparse
+
+    transmissionarray = np.asarray(transmissionarray, dtype = float)
+    if np.ndim(polindex) == 2:
+        polindex = polindex[:, :, np.newaxis]
+    if polweight is None:
+        polweight = np.ones(np.shape(polindex))
+    elif np.ndim(polweight) == 2:
+        polweight = polweight[:, :, np.newaxis]
+
+    ns1, ns2, numpoints = np.shape(polindex)
+    ns2prime = np.shape(transmissionarray)[1]
+    if ns1prime is None:
+        ns1prime = ns1
+
+    # element [s1, s2, i, s2prime]
+    rows = np.broadcast_to(np.arange(ns1 * ns2).reshape([ns1, ns2, 1, 1]), (ns1, ns2, numpoints, ns2prime))
+    cols = polindex[:, :, :, np.newaxis] * ns2prime + np.arange(ns2prime)[np.newaxis, np.newaxis, np.newaxis, :]
+    probs = polweight[:, :, :, np.newaxis] * transmissionarray[np.newaxis, :, np.newaxis, :]
+
+    transmissionstararray = scipy.sparse.csr_matrix((probs.reshape(-1), (rows.reshape(-1), cols.reshape(-1))), shape = (ns1 * ns2, ns1prime * ns2prime))
+
+    return(transmissionstararray)
+
+
+def gentransmissionstararray_1endogstate_discrete_sparse(transmissionarray, pol, ns1prime = None):
+    """
+    Sparse transmission star array for a discrete policy function pol[s1, s2] (the index of s1prime).
+    """
+    # pol can be a compact integer type (see getpoldtype in vfi_discrete_func.py) so convert before computing column indices
+    return(gentransmissionstararray_1endogstate_sparse(transmissionarray, np.asarray(pol, dtype = np.intp), ns1prime = ns1prime))
+
+
+def gentransmissionstararray_1endogstate_continuous_sparse(transmissionarray, pol, endogstatevec):
+    """
+    Sparse transmission star array for a continuous policy function pol[s1, s2] (the value of s1prime).
+    The agent moves to the two points of endogstatevec either side of pol with probabilities from getpolweights_1endogstate_continuous.
+    """
+    lowerindex, lowerweight = getpolweights_1endogstate_continuous(pol, endogstatevec)
+    polindex = np.stack([lowerindex, lowerindex + 1], axis = 2)
+    polweight = np.stack([lowerweight, 1 - lowerweight], axis = 2)
+
+    return(gentransmissionstararray_1endogstate_sparse(transmissionarray, polindex, polweight, ns1prime = len(endogstatevec)))
+
+
+def getstationarydist_1endogstate_sparse(transmissionstararray, ns1, method = 'solve', fullstatedistguess = None, crit = 1e-12, maxiter = 100000, callback = None):
+    """
+    Get the stationary distribution from a sparse transmission star array.
+
+    method:
+    - 'solve': solve (I - T') x = 0 with the last equation replaced by sum(x) = 1 using a sparse linear solver
+    - 'power': iterate x = T' x from fullstatedistguess (uniform by default) until the change is below crit
+
+    callback: function called with a record after every iteration of 'power' (see telemetry_func.py)
+
+    Returns fullstatedist[s1, s2] and endogstatedist[s1].
+    """
+    import scipy.sparse
+    import scipy.sparse.linalg
+    import time
+
+    numstates = np.shape(transmissionstararray)[0]
+    ns2 = numstates // ns1
+    transmissionstararray_T = scipy.sparse.csr_matrix(transmissionstararray).transpose().tocsr()
+
+    if method == 'solve':
+        A = scipy.sparse.identity(numstates, format = 'csr') - transmissionstararray_T
+        A = scipy.sparse.vstack([A[: -1], scipy.sparse.csr_matrix(np.ones([1, numstates]))]).tocsc()
+        b = np.zeros(numstates)
+        b[-1] = 1
+        dist = scipy.sparse.linalg.spsolve(A, b)
+    elif method == 'power':
+        if fullstatedistguess is None:
+            dist = np.ones(numstates) / numstates
+        else:
+            dist = np.array(fullstatedistguess, dtype = float).reshape(-1)
+            dist = dist / np.sum(dist)
+        starttime = time.time()
+        iterationi = 0
+        while True:
+            iterationi = iterationi + 1
+            iterationstart = time.time()
+            distnew = transmissionstararray_T.dot(dist)
+            diff = np.max(np.abs(distnew - dist))
+            dist = distnew
+            if callback is not None:
+                callback({'solver': 'getstationarydist_1endogstate_sparse', 'iteration': iterationi, 'diff': float(diff), 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+            if diff < crit:
+                break
+            if iterationi >= maxiter:
+                raise ValueError('Stationary distribution did not converge after ' + str(maxiter) + ' iterations.')
+    else:
+        raise ValueError('method incorrect: ' + str(method))
+
+    fullstatedist = dist.reshape([ns1, ns2])
+    endogstatedist = np.sum(fullstatedist, axis = 1)
+
+    return(fullstatedist, endogstatedist)
+
+
+# Discrete Policy:{{{1
+def distforward_1endogstate_discrete(fullstatedist, pol, transmissionarray, ns1prime = None):
+    """
+    Move fullstatedist[s1, s2] forward one period given the discrete policy function pol[s1, s2].
+    Returns fullstatedist_next[s1prime, s2prime].
+    """
+    ns1, ns2 = np.shape(pol)
+    if ns1prime is None:
+        ns1prime = ns1
+
+    # mass choosing s1prime by current exogenous state
+    endogmass = np.empty([ns1prime, ns2])
+    for s2 in range(ns2):
+        endogmass[:, s2] = np.bincount(pol[:, s2], weights = fullstatedist[:, s2], minlength = ns1prime)
+
+    return(np.dot(endogmass, transmissionarray))
+
+
+def distforward_1endogstate_continuous(fullstatedist, pol, transmissionarray, endogstatevec_future):
+    """
+    Move fullstatedist[s1, s2] forward one period given the continuous policy function pol[s1, s2] (the value of s1prime).
+    The mass at each state is split between the two points of endogstatevec_future either side of pol (see getpolweights_1endogstate_continuous).
+    Returns fullstatedist_next[s1prime, s2prime].
+    """
+    ns1, ns2 = np.shape(pol)
+    ns1prime = len(endogstatevec_future)
+    lowerindex, lowerweight = getpolweights_1endogstate_continuous(pol, endogstatevec_future)
+
+    endogmass = np.empty([ns1prime, ns2])
+    for s2 in range(ns2):
+        endogmass[:, s2] = np.bincount(lowerindex[:, s2], weights = fullstatedist[:, s2] * lowerweight[:, s2], minlength = ns1prime) + np.bincount(lowerindex[:, s2] + 1, weights = fullstatedist[:, s2] * (1 - lowerweight[:, s2]), minlength = ns1prime)
+
+    return(np.dot(endogmass, transmissionarray))
+
+
+def expectationback_1endogstate_continuous(E, pol, transmissionarray, endogstatevec_future):
+    """
+    Given E[s1prime, s2prime], a function of next period's state, return its expectation today E_now[s1, s2] = E[E(s1prime, s2prime) | s1, s2] given the continuous policy function pol[s1, s2].
+    This is the transpose of distforward_1endogstate_continuous: sum(distforward(D) * E) = sum(D * expectationback(E)).
+    """
+    lowerindex, lowerweight = getpolweights_1endogstate_continuous(pol, endogstatevec_future)
+    # EP[s1prime, s2] = E[E(s1prime, s2prime) | s2]
+    EP = np.dot(E, np.transpose(transmissionarray))
+    s2index = np.arange(np.shape(pol)[1])[np.newaxis, :]
+
+    return(lowerweight * EP[lowerindex, s2index] + (1 - lowerweight) * EP[lowerindex + 1, s2index])
+
+
+def getstationarydist_1endogstate_discrete_iterate(transmissionarray, pol, fullstatedistguess = None, crit = 1e-10, maxiter = 100000, printinfo = False, callback = None):
+    """
+    Iterate the distribution forward until it converges.
+
+    fullstatedistguess: initial distribution[s1, s2]. By default, use a uniform distribution.
+    callback: function called with a record after every iteration (see telemetry_func.py)
+    """
+    import time
+
+    ns1, ns2 = np.shape(pol)
+    if fullstatedistguess is None:
+        fullstatedist = np.ones([ns1, ns2]) / (ns1 * ns2)
+    else:
+        fullstatedist = np.array(fullstatedistguess, dtype = float)
+        fullstatedist = fullstatedist / np.sum(fullstatedist)
+
+    starttime = time.time()
+    iterationi = 0
+    while True:
+        iterationi = iterationi + 1
+        iterationstart = time.time()
+
+        fullstatedist_new = distforward_1endogstate_discrete(fullstatedist, pol, transmissionarray)
+        diff = np.max(np.abs(fullstatedist_new - fullstatedist))
+        fullstatedist = fullstatedist_new
+        if callback is not None:
+            callback({'solver': 'getstationarydist_1endogstate_discrete_iterate', 'iteration': iterationi, 'diff': float(diff), 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+
+        if diff < crit:
+            break
+        if iterationi >= maxiter:
+            raise ValueError('Stationary distribution did not converge after ' + str(maxiter) + ' iterations.')
+
+    if printinfo is True:
+        print('Stationary distribution converged after ' + str(iterationi) + ' iterations.')
+
+    endogstatedist = np.sum(fullstatedist, axis = 1)
+
+    return(fullstatedist, endogstatedist)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Endogenous grid method (EGM) for the consumption-savings problem:
+V(a, y) = max_{a'} u(R * a + y - a') + beta * E[V(a', y') | y] with a' in [endogstatevec[0], endogstatevec[-1]]
+
+This replaces solvevfi_1endogstate_continuous for this problem. Rather than running an optimizer for every (s1, s2) in every iteration, invert the Euler equation on a grid of a' and interpolate back onto endogstatevec so every iteration is fully vectorized.
+V and pol are returned on endogstatevec in the same format as solvevfi_1endogstate_continuous (V[s1, s2] and pol[s1, s2] gives the value of s1prime) so pol can be input into getpolprobs_1endogstate_continuous as usual.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# EGM:{{{1
+def egm_1endogstate_oneiteration(polprime, margutilfunction, invmargutilfunction, endogstatevec, exogstatevec, transmissionarray, beta, R, s1highgap = 1e-4, Rnext = None, exogstatevec_next = None):
+    """
+    Given next period's policy function polprime[s1prime, s2prime], return this period's policy function pol[s1, s2].
+    Rnext, exogstatevec_next: the return and income next period if they differ from R and exogstatevec (for transition paths where prices change over time)
+
+    1. For every a' in endogstatevec compute beta * R * E[u'(c(a', y')) | y]
+    2. Invert the marginal utility to get c today and then the a today at which a' is optimal (the endogenous grid)
+    3. Interpolate a' back onto endogstatevec. Below the first point of the endogenous grid, the borrowing constraint binds so a' = endogstatevec[0].
+    """
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+    exogstatevec = np.asarray(exogstatevec, dtype = float)
+    if Rnext is None:
+        Rnext = R
+    if exogstatevec_next is None:
+        exogstatevec_next = exogstatevec
+    else:
+        exogstatevec_next = np.asarray(exogstatevec_next, dtype = float)
+
+    # consumption next period at each (a', y')
+    cprime = Rnext * endogstatevec[:, np.newaxis] + exogstatevec_next[np.newaxis, :] - polprime
+    # expected marginal utility[a', y]
+    EMU = np.dot(margutilfunction(cprime), np.transpose(transmissionarray))
+
+    c_endog = invmargutilfunction(beta * Rnext * EMU)
+    a_endog = (c_endog + endogstatevec[:, np.newaxis] - exogstatevec[np.newaxis, :]) / R
+
+    pol = np.empty([len(endogstatevec), len(exogstatevec)])
+    for s2 in range(len(exogstatevec)):
+        # np.interp sets a' to endogstatevec[0] below a_endog[0] (the constraint binds) and endogstatevec[-1] above a_endog[-1] (the top of the grid binds)
+        pol[:, s2] = np.interp(endogstatevec, a_endog[:, s2], endogstatevec)
+
+    # must save strictly less than all assets today
+    pol = np.minimum(pol, R * endogstatevec[:, np.newaxis] + exogstatevec[np.newaxis, :] - s1highgap)
+
+    return(pol)
+
+
+def getV_1endogstate_continuous(pol, utilityfunction, endogstatevec, exogstatevec, transmissionarray, beta, R):
+    """
+    Compute the value of following pol forever with V interpolated linearly between points in endogstatevec.
+    Solve (I - beta * Q) V = u(c) where Q is the sparse transition matrix over (s1, s2) implied by pol.
+    """
+    import scipy.sparse
+    import scipy.sparse.linalg
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import gentransmissionstararray_1endogstate_continuous_sparse
+
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+    exogstatevec = np.asarray(exogstatevec, dtype = float)
+    ns1 = len(endogstatevec)
+    ns2 = len(exogstatevec)
+
+    C = R * endogstatevec[:, np.newaxis] + exogstatevec[np.newaxis, :] - pol
+    U = utilityfunction(C)
+
+    Q = gentransmissionstararray_1endogstate_continuous_sparse(transmissionarray, pol, endogstatevec)
+
+    A = scipy.sparse.identity(ns1 * ns2, format = 'csr') - beta * Q
+    V = scipy.sparse.linalg.spsolve(A.tocsc(), U.reshape(-1))
+
+    return(V.reshape([ns1, ns2]))
+
+
+def solveegm_1endogstate(utilityfunction, margutilfunction, invmargutilfunction, endogstatevec, exogstatevec, transmissionarray, beta, R, crit = 1e-8, printinfo = False, polguess = None, s1highgap = 1e-4, maxiter = 10000, callback = None):
+    """
+    Solve the infinite horizon consumption-savings problem by iterating on the policy function using EGM.
+
+    utilityfunction, margutilfunction, invmargutilfunction: u(c), u'(c) and the inverse of u' (all applied to arrays)
+    R: gross return on savings
+    polguess: initial guess of pol[s1, s2] (by default, save endogstatevec[0])
+    s1highgap: must save at most R * s1 + s2 - s1highgap (same as the boundfunction in continuous_cons.py)
+    callback: function called with a record after every iteration (see telemetry_func.py). diff is the change in the policy function.
+
+    Returns V[s1, s2] and pol[s1, s2].
+    """
+    import time
+
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+    exogstatevec = np.asarray(exogstatevec, dtype = float)
+
+    if polguess is None:
+        pol = np.full([len(endogstatevec), len(exogstatevec)], endogstatevec[0])
+    else:
+        pol = np.array(polguess, dtype = float)
+
+    starttime = time.time()
+    iterationi = 0
+    while True:
+        iterationi = iterationi + 1
+        iterationstart = time.time()
+
+        polnew = egm_1endogstate_oneiteration(pol, margutilfunction, invmargutilfunction, endogstatevec, exogstatevec, transmissionarray, beta, R, s1highgap = s1highgap)
+
+        diff = np.max(np.abs(polnew - pol))
+        pol = polnew
+        if printinfo is True:
+            print('Iteration ' + str(iterationi) + '. Difference: ' + str(diff) + '.')
+        if callback is not None:
+            callback({'solver': 'solveegm_1endogstate', 'iteration': iterationi, 'diff': float(diff), 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+
+        if diff < crit:
+            break
+        if iterationi >= maxiter:
+            raise ValueError('EGM did not converge after ' + str(maxiter) + ' iterations.')
+
+    V = getV_1endogstate_continuous(pol, utilityfunction, endogstatevec, exogstatevec, transmissionarray, beta, R)
+
+    return(V, pol)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Vectorized Epstein-Zin aggregator:
+V = ((1 - beta) * c^(1 - invies) + beta * CE^(1 - invies))^(1 / (1 - invies))
+CE = (E[V'^(1 - rra)])^(1 / (1 - rra))
+(with the usual log limits when invies = 1 or rra = 1).
+
+Write g(x) = x^(1 - invies) / (1 - invies) (or log(x) if invies = 1). Then V = ginv((1 - beta) * W) where W = g(c) + beta / (1 - beta) * g(CE).
+ginv is increasing so maximising V over s1prime is the same as maximising W. W has the same form as the CRRA problem: a reward g(c) which can be computed once before solving plus a continuation value beta / (1 - beta) * g(CE) which only depends upon (s2, s1prime).
+So the solvers can maximise W exactly as in the CRRA case and only convert W into V after the maximisation.
+
+The certainty equivalent requires V' > 0 so start from a positive guess of V.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Functions:{{{1
+def g_epsteinzin(x, invies):
+    """
+    x^(1 - invies) / (1 - invies) or log(x) if invies = 1.
+    """
+    if invies == 1:
+        return(np.log(x))
+    else:
+        return(x ** (1 - invies) / (1 - invies))
+
+
+def ginv_epsteinzin(y, invies):
+    """
+    Inverse of g_epsteinzin.
+    """
+    if invies == 1:
+        return(np.exp(y))
+    else:
+        return(((1 - invies) * y) ** (1 / (1 - invies)))
+
+
+def getriskmoment(Vprime, transmissionarray, rra):
+    """
+    M[s2, s1prime] = sum_s2prime transmissionarray[s2, s2prime] * Vprime[s1prime, s2prime]^(1 - rra) (or the expectation of log(Vprime) if rra = 1).
+    """
+    if rra == 1:
+        return(np.dot(transmissionarray, np.transpose(np.log(Vprime))))
+    else:
+        return(np.dot(transmissionarray, np.transpose(Vprime ** (1 - rra))))
+
+
+def getcertaintyequivalent_frommoment(M, rra):
+    """
+    Convert the output of getriskmoment into the certainty equivalent.
+    """
+    if rra == 1:
+        return(np.exp(M))
+    else:
+        return(M ** (1 / (1 - rra)))
+
+
+def getcertaintyequivalent(Vprime, transmissionarray, rra):
+    """
+    CE[s2, s1prime] = (sum_s2prime transmissionarray[s2, s2prime] * Vprime[s1prime, s2prime]^(1 - rra))^(1 / (1 - rra)).
+    """
+    return(getcertaintyequivalent_frommoment(getriskmoment(Vprime, transmissionarray, rra), rra))
+
+
+def getcontinuation_epsteinzin(Vprime, transmissionarray, beta, rra, invies):
+    """
+    beta / (1 - beta) * g(CE[s2, s1prime]). This plays the role of betaEV[s2, s1prime] in the CRRA problem.
+    """
+    CE = getcertaintyequivalent(Vprime, transmissionarray, rra)
+    return(beta / (1 - beta) * g_epsteinzin(CE, invies))
+
+
+def getV_epsteinzin(W, beta, invies):
+    """
+    Convert W = g(c) + beta / (1 - beta) * g(CE) into V.
+    """
+    return(ginv_epsteinzin((1 - beta) * W, invies))
+
+
+def vf_epsteinzin_vec(c, CE, beta, invies):
+    """
+    Epstein-Zin value for arrays of consumption and certainty equivalents (which are broadcast together).
+    """
+    W = g_epsteinzin(c, invies) + beta / (1 - beta) * g_epsteinzin(CE, invies)
+    return(getV_epsteinzin(W, beta, invies))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Interpolation on a fixed grid where the work that does not depend upon the point being interpolated is done once.
+
+- getgridinfo(grid): done once per grid. Records whether the grid is uniform or uniform in logs (like the np.exp(np.linspace(np.log(low), np.log(high), n)) grids used in the examples). The interval containing a point is then found directly by arithmetic rather than by a binary search (np.searchsorted).
+- getinterpolant(gridinfo, table, method): done once per table (for example once per iteration for betaEV[s1prime, s2]). Computes the coefficients of the piecewise polynomial in every interval and every column of table.
+- evalinterpolant_owncolumn/evalinterpolant_allcolumns: evaluate the interpolant at many points.
+
+method options:
+- 'linear': linear interpolation
+- 'pchip': monotone piecewise cubic Hermite interpolation (Fritsch-Carlson slopes as in scipy.interpolate.PchipInterpolator). Preserves monotonicity but not concavity.
+- 'schumaker': Schumaker (1983) shape-preserving quadratic spline with the slopes in Judd (1998). Preserves monotonicity and concavity. Each interval is split into two quadratics at a knot xi.
+
+Points outside the grid are extrapolated using the polynomial of the first or last interval.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Grid:{{{1
+def getgridinfo(grid, rtol = 1e-9):
+    """
+    Return a dict describing grid with spacing 'uniform', 'loguniform' or None (search needed).
+    """
+    grid = np.asarray(grid, dtype = float)
+    if len(grid) < 2:
+        raise ValueError('grid must have at least 2 points.')
+
+    gridinfo = {'grid': grid, 'spacing': None}
+
+    step = (grid[-1] - grid[0]) / (len(grid) - 1)
+    if np.allclose(np.diff(grid), step, rtol = rtol, atol = 0):
+        gridinfo['spacing'] = 'uniform'
+        gridinfo['start'] = grid[0]
+        gridinfo['step'] = step
+    elif grid[0] > 0:
+        logstep = (np.log(grid[-1]) - np.log(grid[0])) / (len(grid) - 1)
+        if np.allclose(np.diff(np.log(grid)), logstep, rtol = rtol, atol = 0):
+            gridinfo['spacing'] = 'loguniform'
+            gridinfo['start'] = np.log(grid[0])
+            gridinfo['step'] = logstep
+
+    return(gridinfo)
+
+
+def getlowerindex(gridinfo, x):
+    """
+    Return the index i of the interval [grid[i], grid[i + 1]] containing x (clipped to the first and last intervals).
+    """
+    grid = gridinfo['grid']
+    n = len(grid)
+    x = np.asarray(x, dtype = float)
+
+    if gridinfo['spacing'] is None:
+        return(np.clip(np.searchsorted(grid, x, side = 'right') - 1, 0, n - 2))
+
+    if gridinfo['spacing'] == 'uniform':
+        position = (x - gridinfo['start']) / gridinfo['step']
+    else:
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            position = (np.log(x) - gridinfo['start']) / gridinfo['step']
+        # log of x <= 0 is nan or -inf so put it in the first interval
+        position = np.where(x > 0, position, 0)
+    lowerindex = np.clip(np.floor(position), 0, n - 2).astype(np.intp)
+
+    # the arithmetic can be off by one at the grid points due to rounding
+    lowerindex = lowerindex - ((grid[lowerindex] > x) & (lowerindex > 0))
+    lowerindex = lowerindex + ((grid[lowerindex + 1] <= x) & (lowerindex < n - 2))
+
+    return(lowerindex)
+
+
+# Coefficients:{{{1
+def getslopes_schumaker(grid, table, delta):
+    """
+    Slopes at each grid point from Judd (1998): a weighted average of the slopes of the neighbouring intervals if they have the same sign and zero otherwise.
+    """
+    dx = np.diff(grid)[:, np.newaxis]
+    L = np.sqrt(dx ** 2 + np.diff(table, axis = 0) ** 2)
+
+    slopes = np.empty(np.shape(table))
+    samesign = delta[: -1] * delta[1:] > 0
+    slopes[1: -1] = np.where(samesign, (L[: -1] * delta[: -1] + L[1:] * delta[1:]) / (L[: -1] + L[1:]), 0)
+    slopes[0] = (3 * delta[0] - slopes[1]) / 2
+    slopes[-1] = (3 * delta[-1] - slopes[-2]) / 2
+
+    return(slopes)
+
+
+def getinterpolant(gridinfo, table, method = 'linear'):
+    """
+    Return the interpolant of table[s1, ...] over gridinfo['grid'] (the first axis of table).
+    The interpolant is a dict where coeffs[k][i] is the coefficient on (x - grid[i]) ** k in interval i.
+    With method = 'schumaker', the interval is split at xi[i] and coeffs2[k][i] is the coefficient on (x - xi[i]) ** k above xi[i].
+    """
+    grid = gridinfo['grid']
+    table = np.asarray(table, dtype = float)
+    dx = np.diff(grid).reshape([-1] + [1] * (np.ndim(table) - 1))
+    delta = np.diff(table, axis = 0) / dx
+
+    interpolant = {'gridinfo': gridinfo, 'method': method}
+    if method == 'linear':
+        interpolant['coeffs'] = [table[: -1], delta]
+    elif method == 'pchip':
+        import scipy.interpolate
+
+        # c[m] is the coefficient on (x - grid[i]) ** (3 - m)
+        c = scipy.interpolate.PchipInterpolator(grid, table, axis = 0).c
+        interpolant['coeffs'] = [c[3], c[2], c[1], c[0]]
+    elif method == 'schumaker':
+        tableshape = np.shape(table)
+        table2 = table.reshape([tableshape[0], -1])
+        dx = dx.reshape([-1, 1])
+        delta = delta.reshape([tableshape[0] - 1, -1])
+        slopes = getslopes_schumaker(grid, table2, delta)
+        slopelow = slopes[: -1]
+        slopehigh = slopes[1:]
+
+        # position of the knot in each interval relative to grid[i]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            alpha = np.where((slopehigh - delta) * (slopelow - delta) >= 0, dx / 2, np.where(np.abs(slopehigh - delta) < np.abs(slopelow - delta), dx * (slopehigh - delta) / (slopehigh - slopelow), dx + dx * (slopelow - delta) / (slopehigh - slopelow)))
+        # the knot must lie within the interval (it can be outside due to rounding)
+        alpha = np.clip(np.nan_to_num(alpha), 0, dx)
+        beta = dx - alpha
+
+        # slope at the knot
+        slopeknot = (2 * (table2[1:] - table2[: -1]) - (alpha * slopelow + beta * slopehigh)) / dx
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            curvelow = np.where(alpha > 0, (slopeknot - slopelow) / (2 * alpha), 0)
+            curvehigh = np.where(beta > 0, (slopehigh - slopeknot) / (2 * beta), 0)
+        valueknot = table2[: -1] + alpha * (slopelow + slopeknot) / 2
+
+        def reshape(array):
+            return(array.reshape([tableshape[0] - 1] + list(tableshape[1:])))
+
+        interpolant['coeffs'] = [table[: -1], reshape(slopelow), reshape(curvelow)]
+        interpolant['xi'] = reshape(alpha)
+        interpolant['coeffs2'] = [reshape(valueknot), reshape(slopeknot), reshape(curvehigh)]
+    else:
+        raise ValueError('method incorrect: ' + str(method))
+
+    return(interpolant)
+
+
+# Evaluate:{{{1
+def evalpolynomial(coeffs, d):
+    """
+    Evaluate sum_k coeffs[k] * d ** k using Horner's method.
+    """
+    value = coeffs[-1]
+    for coeff in reversed(coeffs[: -1]):
+        value = coeff + d * value
+    return(value)
+
+
+def evalinterpolant_select(interpolant, lowerindex, d, select):
+    """
+    Evaluate the interpolant given lowerindex, the distance d from grid[lowerindex] and select which picks out the coefficients from each coefficient array.
+    """
+    coeffs = [coeff[select] for coeff in interpolant['coeffs']]
+    value = evalpolynomial(coeffs, d)
+    if interpolant['method'] == 'schumaker':
+        xi = interpolant['xi'][select]
+        coeffs2 = [coeff[select] for coeff in interpolant['coeffs2']]
+        value = np.where(d < xi, value, evalpolynomial(coeffs2, d - xi))
+    return(value)
+
+
+def evalinterpolant_owncolumn(interpolant, x):
+    """
+    Evaluate an interpolant of table[s1prime, s2] at x[s1, s2] using column s2 of table for each point.
+    """
+    lowerindex = getlowerindex(interpolant['gridinfo'], x)
+    d = x - interpolant['gridinfo']['grid'][lowerindex]
+    s2index = np.arange(np.shape(x)[1])[np.newaxis, :]
+
+    return(evalinterpolant_select(interpolant, lowerindex, d, (lowerindex, s2index)))
+
+
+def evalinterpolant_allcolumns(interpolant, x):
+    """
+    Evaluate every column of an interpolant of table[s1prime, s2prime] at x[s1, s2].
+    Returns an array of shape [ns1, ns2, ns2prime].
+    """
+    lowerindex = getlowerindex(interpolant['gridinfo'], x)
+    d = (x - interpolant['gridinfo']['grid'][lowerindex])[:, :, np.newaxis]
+
+    return(evalinterpolant_select(interpolant, lowerindex, d, lowerindex))
+
+
+def interpolate(grid, table, x, method = 'linear'):
+    """
+    Interpolate table[s1, ...] on grid at the points x (a 1-D array). Returns an array of shape [len(x), ...].
+    Only use when interpolating once since the grid and the coefficients are not kept.
+    """
+    interpolant = getinterpolant(getgridinfo(grid), table, method = method)
+    x = np.asarray(x, dtype = float)
+    lowerindex = getlowerindex(interpolant['gridinfo'], x)
+    d = (x - interpolant['gridinfo']['grid'][lowerindex]).reshape([-1] + [1] * (np.ndim(table) - 1))
+
+    return(evalinterpolant_select(interpolant, lowerindex, d, lowerindex))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Multigrid continuation: solve on a sequence of increasingly fine endogenous grids (for example ns1 = 100, 400, 2000) and use V from each grid, interpolated onto the next grid, as the initial guess on the next grid.
+Most of the iterations then happen on the cheap coarse grids and only a few are needed on the fine grid.
+
+The grids should cover the same range since V is only interpolated and not extrapolated.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Interpolation:{{{1
+def interpV_1endogstate(endogstatevec_old, V_old, endogstatevec_new):
+    """
+    Linearly interpolate V_old[s1, s2] on endogstatevec_old onto endogstatevec_new separately for each s2.
+    Points outside endogstatevec_old take the value at the nearest end point.
+    """
+    V_new = np.empty([len(endogstatevec_new), np.shape(V_old)[1]])
+    for s2 in range(np.shape(V_old)[1]):
+        V_new[:, s2] = np.interp(endogstatevec_new, endogstatevec_old, V_old[:, s2])
+
+    return(V_new)
+
+
+# Continuation:{{{1
+def solvevfi_1endogstate_multigrid(solvefunction, endogstatevec_list, Vguess = None, printinfo = False):
+    """
+    Solve on each grid in endogstatevec_list in turn.
+
+    solvefunction(endogstatevec, Vguess, callback) solves on endogstatevec starting from Vguess (None on the first grid unless Vguess is specified), passes callback to the solver and returns (V, pol).
+    Vguess: initial guess of V on the first grid
+
+    Returns V and pol on the last grid and a list with a dict for each grid containing ns1, iterations and time_s.
+    """
+    import time
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from telemetry_func import getcallback_collector
+
+    levelinfo = []
+    for leveli in range(len(endogstatevec_list)):
+        endogstatevec = np.asarray(endogstatevec_list[leveli], dtype = float)
+        if leveli > 0:
+            Vguess = interpV_1endogstate(np.asarray(endogstatevec_list[leveli - 1], dtype = float), V, endogstatevec)
+
+        records, callback = getcallback_collector()
+        starttime = time.time()
+        V, pol = solvefunction(endogstatevec, Vguess, callback)
+        levelinfo.append({'ns1': len(endogstatevec), 'iterations': len(records), 'time_s': time.time() - starttime})
+
+        if printinfo is True:
+            print('Grid ' + str(leveli + 1) + ' (ns1 = ' + str(len(endogstatevec)) + '): ' + str(len(records)) + ' iterations in ' + str(levelinfo[-1]['time_s']) + ' seconds.')
+
+    return(V, pol, levelinfo)
+
+
+def solvevfi_1endogstate_discrete_multigrid(budgetfunction, endogstatevec_list, exogstatevec, transmissionarray, beta, utility = 'log', rra = None, negvalue = -1e8, Vguess = None, printinfo = False, **solveroptions):
+    """
+    Multigrid continuation for the discrete solver. The rewardarray on each grid is built with getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = utility, rra = rra, negvalue = negvalue).
+    solveroptions are passed to solvevfi_1endogstate_discrete_blocks (for example crit, howard or search).
+    pol on the last grid gives indices of the last grid.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    from vfi_discrete_func import solvevfi_1endogstate_discrete_blocks
+
+    def solvefunction(endogstatevec, Vguess, callback):
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, utility = utility, rra = rra, negvalue = negvalue)
+        return(solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, beta, Vguess = Vguess, callback = callback, **solveroptions))
+
+    return(solvevfi_1endogstate_multigrid(solvefunction, endogstatevec_list, Vguess = Vguess, printinfo = printinfo))
+
+
+def solvevfi_1endogstate_continuous_multigrid(inputfunction, endogstatevec_list, exogstatevec, transmissionarray, beta, Vguess = None, printinfo = False, **solveroptions):
+    """
+    Multigrid continuation for the batched continuous solver.
+    solveroptions are passed to solvevfi_1endogstate_continuous_batch (for example functiontype, boundfunction or crit).
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from vfi_continuous_func import solvevfi_1endogstate_continuous_batch
+
+    def solvefunction(endogstatevec, Vguess, callback):
+        return(solvevfi_1endogstate_continuous_batch(inputfunction, endogstatevec, exogstatevec, transmissionarray, beta, Vguess = Vguess, callback = callback, **solveroptions))
+
+    return(solvevfi_1endogstate_multigrid(solvefunction, endogstatevec_list, Vguess = Vguess, printinfo = printinfo))
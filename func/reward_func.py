@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Construct the rewardarray[s1, s2, s1prime] used by the discrete solvers using numpy broadcasting rather than looping over every (s1, s2, s1prime).
+
+budgetfunction(s1val, s2val, s1primeval) should be written with standard arithmetic operators so that it works on arrays. It is called with arrays of shape [n, 1, 1], [1, ns2, 1] and [1, 1, ns1prime] and so returns consumption of shape [n, ns2, ns1prime].
+For example:
+def budgetfunction(endogstate_now, exogstate, endogstate_future):
+    C = endogstate_now * R + exogstate - endogstate_future
+    return(C)
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Utility:{{{1
+def getutility(C, utility = 'log', rra = None, negvalue = -1e8, dtype = float):
+    """
+    Convert an array of consumption into an array of utility.
+    dtype: dtype of the returned array (np.float32 for the reduced precision mode in vfi_discrete_func.py). Utility is computed in float64 and rounded once.
+
+    utility options:
+    - 'log': log(C) when C > 0 and negvalue otherwise
+    - 'crra': C ** (1 - rra) / (1 - rra) when C > 0 and negvalue otherwise (log if rra == 1)
+    - 'c': return C itself (used for Epstein-Zin where the aggregator is applied later)
+    - a function which takes an array of consumption and returns an array of utility
+    """
+    if utility == 'c':
+        return(np.array(C, dtype = dtype))
+    if callable(utility):
+        return(np.asarray(utility(C), dtype = dtype))
+
+    U = np.full(np.shape(C), negvalue, dtype = dtype)
+    positive = C > 0
+    if utility == 'log' or (utility == 'crra' and rra == 1):
+        np.log(C, out = U, where = positive)
+    elif utility == 'crra':
+        if rra is None:
+            raise ValueError('Need to specify rra when utility is crra.')
+        # divide before converting to dtype so utility is only rounded once
+        Cpositive = np.asarray(C, dtype = float)[positive]
+        U[positive] = Cpositive ** (1 - rra) / (1 - rra)
+    else:
+        raise ValueError('utility incorrect: ' + str(utility))
+
+    return(U)
+
+
+# Reward Array:{{{1
+def getrewardblock_1endogstate(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future, utility = 'log', rra = None, negvalue = -1e8, dtype = float):
+    """
+    Compute the rewardarray for every value of endogstatevec_now i.e. returns an array of shape [len(endogstatevec_now), ns2, ns1prime].
+    To compute a block of s1 values just input a slice of the full endogstatevec_now.
+    """
+    s1vals = np.asarray(endogstatevec_now, dtype = float)[:, None, None]
+    s2vals = np.asarray(exogstatevec, dtype = float)[None, :, None]
+    s1primevals = np.asarray(endogstatevec_future, dtype = float)[None, None, :]
+
+    C = budgetfunction(s1vals, s2vals, s1primevals)
+    # ensure C has full shape even if budgetfunction does not depend upon one of the states
+    C = np.broadcast_to(C, (s1vals.shape[0], s2vals.shape[1], s1primevals.shape[2]))
+
+    return(getutility(C, utility = utility, rra = rra, negvalue = negvalue, dtype = dtype))
+
+
+def getrewardarray_1endogstate_blocks(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future = None, utility = 'log', rra = None, negvalue = -1e8, chunksize = None, dtype = float):
+    """
+    Generator that yields (s1start, s1end, rewardblock) where rewardblock = rewardarray[s1start: s1end].
+    chunksize is the number of s1 values in each block. If chunksize is None then yield the full array as one block.
+    """
+    if endogstatevec_future is None:
+        endogstatevec_future = endogstatevec_now
+
+    ns1 = len(endogstatevec_now)
+    if chunksize is None:
+        chunksize = ns1
+    endogstatevec_now = np.asarray(endogstatevec_now, dtype = float)
+
+    for s1start in range(0, ns1, chunksize):
+        s1end = min(s1start + chunksize, ns1)
+        rewardblock = getrewardblock_1endogstate(budgetfunction, endogstatevec_now[s1start: s1end], exogstatevec, endogstatevec_future, utility = utility, rra = rra, negvalue = negvalue, dtype = dtype)
+        yield(s1start, s1end, rewardblock)
+
+
+def getrewardarray_1endogstate(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future = None, utility = 'log', rra = None, negvalue = -1e8, chunksize = None, dtype = float):
+    """
+    Return the full rewardarray[s1, s2, s1prime].
+
+    If endogstatevec_future is None then use endogstatevec_now (the infinite horizon case).
+    chunksize: if specified, only compute chunksize values of s1 at a time so the temporary arrays used in computing consumption and utility have size at most chunksize * ns2 * ns1prime rather than the size of the full array.
+    dtype: dtype of rewardarray (np.float32 halves the memory). Use chunksize as well so consumption is never computed for the full array in float64.
+    """
+    if endogstatevec_future is None:
+        endogstatevec_future = endogstatevec_now
+
+    if chunksize is None:
+        return(getrewardblock_1endogstate(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future, utility = utility, rra = rra, negvalue = negvalue, dtype = dtype))
+
+    rewardarray = np.empty([len(endogstatevec_now), len(exogstatevec), len(endogstatevec_future)], dtype = dtype)
+    for s1start, s1end, rewardblock in getrewardarray_1endogstate_blocks(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future = endogstatevec_future, utility = utility, rra = rra, negvalue = negvalue, chunksize = chunksize, dtype = dtype):
+        rewardarray[s1start: s1end] = rewardblock
+
+    return(rewardarray)
+
+
+def getrewardfunction_1endogstate(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future = None, utility = 'log', rra = None, negvalue = -1e8, dtype = float):
+    """
+    Return a function rewardfunction(s1start, s1end) which computes rewardarray[s1start: s1end] when it is called.
+    This allows the solvers in vfi_discrete_func.py to work through the rewardarray in blocks without ever creating the full array.
+    """
+    if endogstatevec_future is None:
+        endogstatevec_future = endogstatevec_now
+    endogstatevec_now = np.asarray(endogstatevec_now, dtype = float)
+
+    def rewardfunction(s1start, s1end):
+        return(getrewardblock_1endogstate(budgetfunction, endogstatevec_now[s1start: s1end], exogstatevec, endogstatevec_future, utility = utility, rra = rra, negvalue = negvalue, dtype = dtype))
+
+    return(rewardfunction)
+
+
+def getrewardarray_1endogstate_memmap(budgetfunction, endogstatevec_now, exogstatevec, filename, endogstatevec_future = None, utility = 'log', rra = None, negvalue = -1e8, chunksize = 100, dtype = np.float32, reuse = False):
+    """
+    Write rewardarray[s1, s2, s1prime] to the .npy file filename chunksize values of s1 at a time and return it as a read-only memory-mapped array.
+    This is for grids where the rewardarray does not fit in memory. Only one chunk exists in memory at a time. The solvers in vfi_discrete_func.py read a memory-mapped rewardarray in sequential blocks of s1.
+
+    reuse: if filename already exists and was built from the same inputs (checked with a hash of the inputs stored in filename + '.json' - see cache_func.py), return it without rebuilding. The hash of budgetfunction covers its code, defaults, closure and numeric globals but is not a proof that two functions give the same consumption (for example if budgetfunction calls another function that has changed) so only use reuse when budgetfunction depends on nothing else.
+    """
+    import json
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from cache_func import gethash
+
+    if endogstatevec_future is None:
+        endogstatevec_future = endogstatevec_now
+    filename = str(filename)
+
+    key = gethash({'function': 'getrewardarray_1endogstate_memmap', 'budgetfunction': budgetfunction, 'endogstatevec_now': np.asarray(endogstatevec_now, dtype = float), 'exogstatevec': np.asarray(exogstatevec, dtype = float), 'endogstatevec_future': np.asarray(endogstatevec_future, dtype = float), 'utility': utility, 'rra': rra, 'negvalue': negvalue, 'dtype': str(np.dtype(dtype))})
+    if reuse is True and os.path.isfile(filename) and os.path.isfile(filename + '.json'):
+        with open(filename + '.json') as f:
+            if json.load(f)['key'] == key:
+                return(np.load(filename, mmap_mode = 'r'))
+
+    if os.path.dirname(filename) != '' and not os.path.isdir(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    if os.path.isfile(filename + '.json'):
+        os.remove(filename + '.json')
+
+    # create the file with its .npy header and then write the chunks with ordinary file writes so the whole file is never mapped into memory while writing
+    tempname = filename + '.tmp.npy'
+    shape = (len(endogstatevec_now), len(exogstatevec), len(endogstatevec_future))
+    rewardarray = np.lib.format.open_memmap(tempname, mode = 'w+', dtype = dtype, shape = shape)
+    offset = rewardarray.offset
+    del rewardarray
+    with open(tempname, 'r+b') as f:
+        f.seek(offset)
+        for s1start, s1end, rewardblock in getrewardarray_1endogstate_blocks(budgetfunction, endogstatevec_now, exogstatevec, endogstatevec_future = endogstatevec_future, utility = utility, rra = rra, negvalue = negvalue, chunksize = chunksize, dtype = dtype):
+            f.write(np.ascontiguousarray(rewardblock).tobytes())
+    os.replace(tempname, filename)
+    with open(filename + '.json', 'w') as f:
+        json.dump({'key': key}, f)
+
+    return(np.load(filename, mmap_mode = 'r'))
+
+
+# Compare:{{{1
+def compare():
+    """
+    Check the vectorized rewardarray matches the rewardarray computed by looping.
+    """
+    R = 1.048
+    endogstatevec = np.exp(np.linspace(np.log(0.01), np.log(100), 50))
+    exogstatevec = [0.01, 0.1]
+    ns1 = len(endogstatevec)
+    ns2 = len(exogstatevec)
+
+    rewardarray_loop = np.empty([ns1, ns2, ns1])
+    for s1 in range(ns1):
+        for s2 in range(ns2):
+            for s1prime in range(ns1):
+                C = endogstatevec[s1] * R + exogstatevec[s2] - endogstatevec[s1prime]
+                if C > 0:
+                    rewardarray_loop[s1, s2, s1prime] = np.log(C)
+                else:
+                    rewardarray_loop[s1, s2, s1prime] = -1e8
+
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec)
+    rewardarray_chunked = getrewardarray_1endogstate(budgetfunction, endogstatevec, exogstatevec, chunksize = 7)
+
+    if np.max(np.abs(rewardarray - rewardarray_loop)) > 1e-12 or np.max(np.abs(rewardarray_chunked - rewardarray_loop)) > 1e-12:
+        raise ValueError('Vectorized rewardarray differs from loop rewardarray.')
+    else:
+        print('Same')
+
+
+# Run:{{{1
+if __name__ == "__main__":
+    compare()
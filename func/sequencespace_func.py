@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Transition paths in the sequence space for the consumption-savings problem solved by EGM (see egm_func.py) when the return R_t changes over time.
+
+The household block maps a path of returns Rpath[t] for t = 0, ..., T - 1 into the path of aggregate assets Kpath[t] (the mean of s1 at the start of period t). Income in each exogenous state in period t is exogstatepath[t] (for example W_t * exogstatevec in the Aiyagari model). After period T - 1 the economy is back at the steady state with return R_ss and income exogstatevec_ss.
+- backward: solve back from the steady state policy function using egm_1endogstate_oneiteration with R_t and R_{t + 1}
+- forward: move the distribution forwards from the steady state distribution using the lottery weights in distforward_1endogstate_continuous
+
+The Jacobian J[t, s] = dKpath[t] / dRpath[s] around the steady state is computed with the fake news algorithm (Auclert, Bardoczy, Rognlie and Straub (2021)) which needs a single backward pass of T periods rather than T backward and forward passes:
+For the Jacobian, income is a function of the return exogstatefunction(R) (for example W(R) * exogstatevec when W is pinned down by R).
+1. Backward: perturb R in period T - 1 by h and solve back. By time invariance, the change in the policy function u periods before the shock is the change in the period 0 policy function from news at period 0 of a shock at period u. This gives the change in the period 1 distribution dD[u].
+2. Expectation vectors: E[0] = endogstatevec and E[k] = E[E[k - 1] | state] using expectationback_1endogstate_continuous, so E[k] gives the expected s1 k periods ahead.
+3. The fake news matrix is F[0, s] = 0 (the period 0 distribution is given) and F[t, s] = sum(E[t - 1] * dD[s]) for t >= 1.
+4. J[t, s] = F[t, s] + J[t - 1, s - 1].
+
+solvetransition_newton then solves for the path of R which sets a residual (for example Kd(R_t) - Ks_t) to zero using Newton's method with a fixed Jacobian computed once around the steady state.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Backward and Forward:{{{1
+def egm_backward_path(Rpath, exogstatepath, pol_ss, R_ss, exogstatevec_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, beta, s1highgap = 1e-4):
+    """
+    Solve back from the steady state policy function pol_ss (which applies from period T onwards at return R_ss and income exogstatevec_ss).
+    exogstatepath[t]: income in each exogenous state in period t
+
+    Returns pollist where pollist[t][s1, s2] is the value of s1prime in period t.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from egm_func import egm_1endogstate_oneiteration
+
+    T = len(Rpath)
+    pollist = [None] * T
+
+    polprime = pol_ss
+    Rnext = R_ss
+    exogstatevec_next = exogstatevec_ss
+    for t in reversed(range(T)):
+        polprime = egm_1endogstate_oneiteration(polprime, margutilfunction, invmargutilfunction, endogstatevec, exogstatepath[t], transmissionarray, beta, Rpath[t], s1highgap = s1highgap, Rnext = Rnext, exogstatevec_next = exogstatevec_next)
+        pollist[t] = polprime
+        Rnext = Rpath[t]
+        exogstatevec_next = exogstatepath[t]
+
+    return(pollist)
+
+
+def dist_forward_path(fullstatedist_start, pollist, transmissionarray, endogstatevec):
+    """
+    Move fullstatedist_start[s1, s2] forwards using the continuous policy functions in pollist.
+    Returns Kpath where Kpath[t] is the mean of s1 in period t for t = 0, ..., len(pollist) - 1.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import distforward_1endogstate_continuous
+
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+
+    Kpath = np.empty(len(pollist))
+    fullstatedist = fullstatedist_start
+    for t in range(len(pollist)):
+        Kpath[t] = np.sum(np.sum(fullstatedist, axis = 1) * endogstatevec)
+        if t < len(pollist) - 1:
+            fullstatedist = distforward_1endogstate_continuous(fullstatedist, pollist[t], transmissionarray, endogstatevec)
+
+    return(Kpath)
+
+
+def getKpath(Rpath, exogstatepath, pol_ss, R_ss, exogstatevec_ss, fullstatedist_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, beta, s1highgap = 1e-4):
+    """
+    The household block: the path of aggregate assets given the paths of returns and income starting from the steady state distribution.
+    """
+    pollist = egm_backward_path(Rpath, exogstatepath, pol_ss, R_ss, exogstatevec_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, beta, s1highgap = s1highgap)
+    return(dist_forward_path(fullstatedist_ss, pollist, transmissionarray, endogstatevec))
+
+
+# Jacobian:{{{1
+def getjacobian_fakenews_egm(exogstatefunction, pol_ss, R_ss, fullstatedist_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, beta, T, h = 1e-4, s1highgap = 1e-4, cache = False, cachedir = None):
+    """
+    Return J[t, s] = dKpath[t] / dRpath[s] around the steady state using the fake news algorithm (see module docstring).
+    exogstatefunction(R): income in each exogenous state given the return R
+    h: size of the perturbation to R used for the one-sided numerical derivative
+    cache: save the Jacobian in the on-disk cache in cache_func.py (in cachedir) keyed on every input including the steady state so later calls with the same steady state load it
+    """
+    if cache is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from cache_func import cachedsolve
+
+        exact = {'function': 'getjacobian_fakenews_egm', 'exogstatefunction': exogstatefunction, 'pol_ss': pol_ss, 'R_ss': R_ss, 'fullstatedist_ss': fullstatedist_ss, 'margutilfunction': margutilfunction, 'invmargutilfunction': invmargutilfunction, 'endogstatevec': endogstatevec, 'transmissionarray': transmissionarray, 'beta': beta, 'T': T, 'h': h, 's1highgap': s1highgap}
+
+        def solvefunction(warmstart):
+            return({'J': getjacobian_fakenews_egm(exogstatefunction, pol_ss, R_ss, fullstatedist_ss, margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, beta, T, h = h, s1highgap = s1highgap)})
+
+        return(cachedsolve(solvefunction, exact, cachedir = cachedir)['J'])
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import distforward_1endogstate_continuous
+    from dist_func import expectationback_1endogstate_continuous
+
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+
+    # 1. backward: shock to R in period T - 1 so pollist[T - 1 - u] is the policy u periods before the shock
+    Rpath = np.full(T, R_ss)
+    Rpath[T - 1] = R_ss + h
+    pollist = egm_backward_path(Rpath, [exogstatefunction(R) for R in Rpath], pol_ss, R_ss, exogstatefunction(R_ss), margutilfunction, invmargutilfunction, endogstatevec, transmissionarray, beta, s1highgap = s1highgap)
+    dist_ss_next = distforward_1endogstate_continuous(fullstatedist_ss, pol_ss, transmissionarray, endogstatevec)
+    # dD[s]: change in the period 1 distribution from news of a shock at s
+    dD = np.array([((distforward_1endogstate_continuous(fullstatedist_ss, pollist[T - 1 - s], transmissionarray, endogstatevec) - dist_ss_next) / h).reshape(-1) for s in range(T)])
+
+    # 2. expectation vectors: Elist[k] = E[k]
+    E = np.repeat(endogstatevec[:, np.newaxis], np.shape(pol_ss)[1], axis = 1)
+    Elist = np.empty([T - 1, np.size(E)])
+    for k in range(T - 1):
+        Elist[k] = E.reshape(-1)
+        E = expectationback_1endogstate_continuous(E, pol_ss, transmissionarray, endogstatevec)
+
+    # 3. fake news matrix
+    F = np.zeros([T, T])
+    F[1:, :] = np.dot(Elist, np.transpose(dD))
+
+    # 4. Jacobian
+    J = F.copy()
+    for t in range(1, T):
+        J[t, 1:] = J[t, 1:] + J[t - 1, :-1]
+
+    return(J)
+
+
+# Newton:{{{1
+def solvetransition_newton(residualfunction, jacobian, Rguess, crit = 1e-8, maxiter = 50, printinfo = False, callback = None):
+    """
+    Solve residualfunction(Rpath) = 0 using Newton's method where jacobian[t, s] = d residual[t] / d Rpath[s] is held fixed (computed once around the steady state).
+    callback: function called with a record after every iteration (see telemetry_func.py). diff is the largest absolute residual.
+
+    Returns Rpath and the residual at Rpath.
+    """
+    import scipy.linalg
+    import time
+
+    jacobianlu = scipy.linalg.lu_factor(jacobian)
+    Rpath = np.array(Rguess, dtype = float)
+
+    starttime = time.time()
+    iterationi = 0
+    while True:
+        iterationstart = time.time()
+        residual = residualfunction(Rpath)
+        diff = np.max(np.abs(residual))
+        if printinfo is True:
+            print('Iteration ' + str(iterationi) + '. Largest residual: ' + str(diff) + '.')
+        if callback is not None:
+            callback({'solver': 'solvetransition_newton', 'iteration': iterationi, 'diff': float(diff), 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+
+        if diff < crit:
+            break
+        if iterationi >= maxiter:
+            raise ValueError('Newton did not converge after ' + str(maxiter) + ' iterations.')
+
+        Rpath = Rpath - scipy.linalg.lu_solve(jacobianlu, residual)
+        iterationi = iterationi + 1
+
+    return(Rpath, residual)
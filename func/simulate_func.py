@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo panel simulation from a solved policy function with one endogenous state.
+
+Agents are simulated in shards of shardsize agents. Each shard has its own random stream spawned from the seed (numpy SeedSequence) so the results only depend upon the seed and shardsize and not upon the number of processes used.
+Only summary statistics are kept by default: for every period the sum and sum of squares of s1 and at the end the number of agents at each (s1, s2). These are added over shards so memory does not grow with N.
+
+The policy function can be:
+- discrete: pol[s1, s2] gives the index of s1prime
+- continuous (continuous = True): pol[s1, s2] gives the value of s1prime. The agent moves to one of the two points of endogstatevec either side of pol with the probabilities from getpolweights_1endogstate_continuous so the simulation has the same transitions as the sparse transmission star array in dist_func.py.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Draws:{{{1
+def drawindex(cumprobs, rng):
+    """
+    Draw one index for each row of cumprobs[n, k] (the cumulative probabilities of each index).
+    """
+    u = rng.random(np.shape(cumprobs)[0])
+    index = np.sum(u[:, np.newaxis] > cumprobs, axis = 1)
+    # guard against cumulative probabilities that sum to slightly less than 1
+    return(np.minimum(index, np.shape(cumprobs)[1] - 1))
+
+
+def getstationarydist_exog(transmissionarray):
+    """
+    Stationary distribution of the exogenous Markov chain.
+    """
+    ns2 = np.shape(transmissionarray)[0]
+    A = np.transpose(transmissionarray) - np.identity(ns2)
+    A[-1, :] = 1
+    b = np.zeros(ns2)
+    b[-1] = 1
+    return(np.linalg.solve(A, b))
+
+
+# Shard:{{{1
+def simulate_1endogstate_shard(pol, transmissionarray, endogstatevec, N, T, seed, s1startdist, s2startdist, continuous = False, storepanel = False):
+    """
+    Simulate N agents for T periods using the random stream seed (a numpy SeedSequence or int).
+    Returns a dict with s1sum[t], s1sumsq[t], finalcount[s1, s2] and s1panel[t, n]/s2panel[t, n] if storepanel is True.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import getpolweights_1endogstate_continuous
+
+    rng = np.random.default_rng(seed)
+    endogstatevec = np.asarray(endogstatevec, dtype = float)
+    ns1 = len(endogstatevec)
+    ns2 = np.shape(transmissionarray)[0]
+    cumtransmission = np.cumsum(transmissionarray, axis = 1)
+
+    if continuous is True:
+        lowerindex, lowerweight = getpolweights_1endogstate_continuous(pol, endogstatevec)
+
+    s1 = np.minimum(np.searchsorted(np.cumsum(s1startdist), rng.random(N), side = 'right'), ns1 - 1)
+    s2 = np.minimum(np.searchsorted(np.cumsum(s2startdist), rng.random(N), side = 'right'), ns2 - 1)
+
+    s1sum = np.empty(T)
+    s1sumsq = np.empty(T)
+    if storepanel is True:
+        s1panel = np.empty([T, N], dtype = np.int32)
+        s2panel = np.empty([T, N], dtype = np.int32)
+    for t in range(T):
+        s1vals = endogstatevec[s1]
+        s1sum[t] = np.sum(s1vals)
+        s1sumsq[t] = np.sum(s1vals ** 2)
+        if storepanel is True:
+            s1panel[t] = s1
+            s2panel[t] = s2
+        if t == T - 1:
+            break
+
+        if continuous is True:
+            s1 = lowerindex[s1, s2] + (rng.random(N) >= lowerweight[s1, s2])
+        else:
+            s1 = pol[s1, s2]
+        s2 = drawindex(cumtransmission[s2], rng)
+
+    finalcount = np.bincount(s1 * ns2 + s2, minlength = ns1 * ns2).reshape([ns1, ns2])
+
+    retdict = {'s1sum': s1sum, 's1sumsq': s1sumsq, 'finalcount': finalcount}
+    if storepanel is True:
+        retdict['s1panel'] = s1panel
+        retdict['s2panel'] = s2panel
+    return(retdict)
+
+
+def simulate_1endogstate_shard_star(args):
+    """
+    simulate_1endogstate_shard with the arguments as a tuple (for multiprocessing).
+    """
+    return(simulate_1endogstate_shard(*args))
+
+
+# Simulate:{{{1
+def simulate_1endogstate(pol, transmissionarray, endogstatevec, N, T, seed = 0, s1startdist = None, s2startdist = None, continuous = False, shardsize = 100000, processes = None, storepanel = False):
+    """
+    Simulate a panel of N agents for T periods.
+
+    s1startdist: distribution over s1 in period 0 (by default everyone starts at endogstatevec[0])
+    s2startdist: distribution over s2 in period 0 (by default the stationary distribution of transmissionarray)
+    shardsize: number of agents simulated at once in each random stream
+    processes: run the shards in this many processes (None runs them in this process)
+    storepanel: also return the indices s1panel[t, n] and s2panel[t, n] (memory grows with N * T so only use for small panels)
+
+    Returns a dict with:
+    - meanlist, varlist: cross-sectional mean and variance of s1 in each period
+    - fullstatedist[s1, s2], endogstatedist[s1]: empirical distribution in the last period (compare with the stationary distribution for large T)
+    """
+    transmissionarray = np.asarray(transmissionarray, dtype = float)
+    if continuous is True:
+        pol = np.asarray(pol)
+    else:
+        # pol can be a compact integer type (see getpoldtype in vfi_discrete_func.py)
+        pol = np.asarray(pol, dtype = np.intp)
+    ns1 = len(endogstatevec)
+    if s1startdist is None:
+        s1startdist = np.zeros(ns1)
+        s1startdist[0] = 1
+    if s2startdist is None:
+        s2startdist = getstationarydist_exog(transmissionarray)
+
+    numshards = int(np.ceil(N / shardsize))
+    seeds = np.random.SeedSequence(seed).spawn(numshards)
+    argslist = [(pol, transmissionarray, endogstatevec, min(shardsize, N - shardi * shardsize), T, seeds[shardi], s1startdist, s2startdist, continuous, storepanel) for shardi in range(numshards)]
+
+    if processes is None:
+        results = [simulate_1endogstate_shard_star(args) for args in argslist]
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(simulate_1endogstate_shard_star, argslist)
+
+    s1sum = np.sum([result['s1sum'] for result in results], axis = 0)
+    s1sumsq = np.sum([result['s1sumsq'] for result in results], axis = 0)
+    finalcount = np.sum([result['finalcount'] for result in results], axis = 0)
+
+    meanlist = s1sum / N
+    varlist = s1sumsq / N - meanlist ** 2
+    fullstatedist = finalcount / N
+
+    retdict = {'meanlist': meanlist, 'varlist': varlist, 'fullstatedist': fullstatedist, 'endogstatedist': np.sum(fullstatedist, axis = 1)}
+    if storepanel is True:
+        retdict['s1panel'] = np.concatenate([result['s1panel'] for result in results], axis = 1)
+        retdict['s2panel'] = np.concatenate([result['s2panel'] for result in results], axis = 1)
+    return(retdict)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Finite horizon solve back with one endogenous state where memory does not need to grow with T.
+
+This mirrors vf_solveback_discrete/vf_solveback_continuous in vfi-general but:
+- Inputs which do not change over time can be given once rather than as a list with an element for every period (see getperiodinput). A list can also contain the same array many times since only references are stored.
+- The discrete rewardsource for period t can be generated when it is needed by getrewardsource(t) so only one period's rewardarray exists at a time.
+- store determines what happens to V and pol in each period:
+  - 'memory': keep V and pol for every period in memory
+  - None: only keep V and pol for the first period
+  - a directory: save V and pol for every period to the directory as .npy files and return them as read-only memory-mapped arrays so they are only loaded when they are used
+
+T is the number of periods including the last period where Vprime is given so there are T - 1 decisions and Vlist/pollist have T - 1 elements.
+
+dist_solveback_1endogstate_generator moves the distribution forwards one period at a time and yields each period's distribution and moments as it goes so only the current distribution needs to be in memory.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# General:{{{1
+def getperiodinput(inputs, t):
+    """
+    Return the input for period t: inputs[t] if inputs is a list or tuple and inputs itself otherwise (the same input in every period).
+    """
+    if isinstance(inputs, (list, tuple)):
+        return(inputs[t])
+    else:
+        return(inputs)
+
+
+def storeperiod(store, t, V, pol, Vlist, pollist):
+    """
+    Add V and pol for period t to Vlist and pollist according to store (see module docstring).
+    """
+    if store == 'memory':
+        Vlist[t] = V
+        pollist[t] = pol
+    elif store is None:
+        if t == 0:
+            Vlist[t] = V
+            pollist[t] = pol
+    else:
+        if not os.path.isdir(store):
+            os.makedirs(store)
+        np.save(Path(store) / Path('V_' + str(t) + '.npy'), V)
+        np.save(Path(store) / Path('pol_' + str(t) + '.npy'), pol)
+        Vlist[t] = np.load(Path(store) / Path('V_' + str(t) + '.npy'), mmap_mode = 'r')
+        pollist[t] = np.load(Path(store) / Path('pol_' + str(t) + '.npy'), mmap_mode = 'r')
+
+
+# Discrete:{{{1
+def vf_solveback_1endogstate_discrete(rewardsource_list, Vprime, transmissionarray_list, beta_list, T, getrewardsource = None, ns1_list = None, blocksize = None, store = 'memory', callback = None, workers = None):
+    """
+    Solve back from Vprime[s1, s2] in period T - 1.
+
+    rewardsource_list: rewardsource in each period (rewardarray[s1, s2, s1prime] or a function rewardfunction(s1start, s1end) - see vfi_discrete_func.py) or a single rewardsource used in every period. A rewardarray can be memory-mapped (see getrewardarray_1endogstate_memmap in reward_func.py) in which case each period sweeps the file in blocks of s1 so periods sharing a rewardarray share one file.
+    getrewardsource: function of t returning the rewardsource for period t (used instead of rewardsource_list if specified)
+    transmissionarray_list, beta_list: list with an element for each period or a single value used in every period
+    ns1_list: number of endogenous states in each period (only needed if rewardsource is a function)
+    callback: function called with a record after each period (see telemetry_func.py)
+    workers: number of threads used in the maximisation each period (see vfi_discrete_func.py)
+
+    Returns Vlist and pollist where pollist[t][s1, s2] is the index of s1prime in period t.
+    """
+    import time
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from vfi_discrete_func import vf_1endogstate_discrete_oneiteration_blocks
+
+    Vlist = [None] * (T - 1)
+    pollist = [None] * (T - 1)
+
+    starttime = time.time()
+    for t in reversed(range(T - 1)):
+        periodstart = time.time()
+        if getrewardsource is not None:
+            rewardsource = getrewardsource(t)
+        else:
+            rewardsource = getperiodinput(rewardsource_list, t)
+        if ns1_list is not None:
+            ns1 = getperiodinput(ns1_list, t)
+        else:
+            ns1 = None
+
+        Vprime, pol = vf_1endogstate_discrete_oneiteration_blocks(rewardsource, Vprime, getperiodinput(transmissionarray_list, t), getperiodinput(beta_list, t), ns1 = ns1, blocksize = blocksize, workers = workers)
+        storeperiod(store, t, Vprime, pol, Vlist, pollist)
+
+        if callback is not None:
+            callback({'solver': 'vf_solveback_1endogstate_discrete', 'iteration': T - 1 - t, 'period': t, 'time_s': time.time() - periodstart, 'elapsed_s': time.time() - starttime})
+
+    return(Vlist, pollist)
+
+
+# Continuous:{{{1
+def vf_solveback_1endogstate_continuous(inputfunction_list, Vprime, endogstate_list, exogstate_list, transmissionarray_list, beta_list, T, functiontype = 'reward', boundfunction_list = None, tol = 1e-8, rra = None, store = 'memory', callback = None):
+    """
+    Solve back from Vprime[s1, s2] in period T - 1 using vf_1endogstate_continuous_oneiteration_batch (so inputfunction and boundfunction must work on arrays - see vfi_continuous_func.py).
+
+    inputfunction_list, boundfunction_list, transmissionarray_list, beta_list: list with an element for each period or a single value used in every period
+    endogstate_list, exogstate_list: list of the grids in each of the T periods
+    callback: function called with a record after each period (see telemetry_func.py)
+
+    Returns Vlist and pollist where pollist[t][s1, s2] is the value of s1prime in period t.
+    """
+    import time
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from vfi_continuous_func import vf_1endogstate_continuous_oneiteration_batch
+
+    Vlist = [None] * (T - 1)
+    pollist = [None] * (T - 1)
+
+    starttime = time.time()
+    for t in reversed(range(T - 1)):
+        periodstart = time.time()
+        Vprime, pol, numevals = vf_1endogstate_continuous_oneiteration_batch(getperiodinput(inputfunction_list, t), Vprime, endogstate_list[t], endogstate_list[t + 1], exogstate_list[t], exogstate_list[t + 1], getperiodinput(transmissionarray_list, t), getperiodinput(beta_list, t), functiontype = functiontype, boundfunction = getperiodinput(boundfunction_list, t), tol = tol, returnnumevals = True, rra = rra)
+        storeperiod(store, t, Vprime, pol, Vlist, pollist)
+
+        if callback is not None:
+            callback({'solver': 'vf_solveback_1endogstate_continuous', 'iteration': T - 1 - t, 'period': t, 'numevals': numevals, 'time_s': time.time() - periodstart, 'elapsed_s': time.time() - starttime})
+
+    return(Vlist, pollist)
+
+
+# Distribution:{{{1
+def dist_solveback_1endogstate_generator(endogstatedist_start, exogstatedist_start, endogstate_list, transmissionarray_list, pollist, continuous = False):
+    """
+    Generator which moves the distribution forwards from period 0 to period T - 1.
+    Each period, the policy function is applied by adding the mass at each state to s1prime (np.bincount) rather than building a transmission star array.
+
+    endogstatedist_start, exogstatedist_start: distribution over s1 and s2 in period 0 (assumed independent)
+    endogstate_list: grids in each of the T periods
+    transmissionarray_list: list with an element for each period or a single transmissionarray used in every period
+    pollist: policy functions from vf_solveback_1endogstate_discrete (indices) or vf_solveback_1endogstate_continuous (values with continuous = True). Memory-mapped arrays are fine.
+
+    Yields a dict for t = 0, ..., T - 1 with t, fullstatedist[s1, s2], endogstatedist[s1] and the mean and variance of s1.
+    """
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from dist_func import distforward_1endogstate_continuous
+    from dist_func import distforward_1endogstate_discrete
+
+    T = len(endogstate_list)
+    fullstatedist = np.outer(np.asarray(endogstatedist_start, dtype = float), np.asarray(exogstatedist_start, dtype = float))
+
+    for t in range(T):
+        endogstatevec = np.asarray(endogstate_list[t], dtype = float)
+        endogstatedist = np.sum(fullstatedist, axis = 1)
+        mean = np.sum(endogstatedist * endogstatevec)
+        var = np.sum(endogstatedist * (endogstatevec - mean) ** 2)
+        yield({'t': t, 'fullstatedist': fullstatedist, 'endogstatedist': endogstatedist, 'mean': mean, 'var': var})
+
+        if t < T - 1:
+            pol = np.asarray(pollist[t])
+            if continuous is True:
+                fullstatedist = distforward_1endogstate_continuous(fullstatedist, pol, getperiodinput(transmissionarray_list, t), np.asarray(endogstate_list[t + 1], dtype = float))
+            else:
+                fullstatedist = distforward_1endogstate_discrete(fullstatedist, pol, getperiodinput(transmissionarray_list, t), ns1prime = len(endogstate_list[t + 1]))
+
+
+def dist_meanvar_solveback(endogstatedist_start, exogstatedist_start, endogstate_list, transmissionarray_list, pollist, continuous = False):
+    """
+    Return the list of means and the list of variances of s1 in each period using dist_solveback_1endogstate_generator without keeping the distributions.
+    """
+    meanlist = []
+    varlist = []
+    for periodinfo in dist_solveback_1endogstate_generator(endogstatedist_start, exogstatedist_start, endogstate_list, transmissionarray_list, pollist, continuous = continuous):
+        meanlist.append(periodinfo['mean'])
+        varlist.append(periodinfo['var'])
+
+    return(meanlist, varlist)
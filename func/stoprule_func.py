@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Stopping rules for value function iteration.
+
+Let Vnew = T(V) where T is the Bellman operator and d = Vnew - V. The MacQueen-Porteus bounds are:
+Vnew + beta / (1 - beta) * min(d) <= V* <= Vnew + beta / (1 - beta) * max(d)
+They hold for any V (including V from policy evaluation) so the gap beta / (1 - beta) * (max(d) - min(d)) bounds the error. Adding a constant to V does not change the policy function in the standard time-separable problem, so V can be moved to the middle of the bounds every iteration.
+The sup-norm change in V only falls at rate beta while the gap falls at the rate at which the differences across states converge, which is usually much faster.
+
+Relative value iteration subtracts V at a reference state ([0, 0]) every iteration so V does not drift by a constant. V* is then recovered from the MacQueen-Porteus bounds at the end.
+
+Neither rule is valid with Epstein-Zin preferences since adding a constant to V is not equivalent to adding a constant to the value today.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# Bounds:{{{1
+def getbounds_macqueenporteus(Vnew, V, beta):
+    """
+    Return lowershift and uppershift such that Vnew + lowershift <= V* <= Vnew + uppershift where Vnew = T(V).
+    """
+    d = Vnew - V
+    return(beta / (1 - beta) * np.min(d), beta / (1 - beta) * np.max(d))
+
+
+def checkstoprule(stoprule, relative):
+    """
+    Raise an error if stoprule or relative are incorrect.
+    """
+    if stoprule not in ['supnorm', 'bounds']:
+        raise ValueError('stoprule incorrect: ' + str(stoprule))
+    if relative not in [True, False]:
+        raise ValueError('relative should be True or False.')
+
+
+def applystoprule(Vnew, V, beta, stoprule = 'supnorm', relative = False):
+    """
+    Given Vnew = T(V), return:
+    - diff: the quantity to compare with crit
+    - Vnext: V to use in the next iteration
+    - Vfinal: the estimate of V* to return if diff < crit
+
+    stoprule:
+    - 'supnorm': diff = max|Vnew - V| (the change in V after normalising when relative is True)
+    - 'bounds': diff is the gap between the MacQueen-Porteus bounds and V is moved to the middle of the bounds
+    relative: subtract Vnext[0, 0] from Vnext
+    """
+    if stoprule == 'supnorm' and relative is False:
+        diff = np.max(np.abs(Vnew - V))
+        return(diff, Vnew, Vnew)
+
+    lowershift, uppershift = getbounds_macqueenporteus(Vnew, V, beta)
+    Vfinal = Vnew + 0.5 * (lowershift + uppershift)
+
+    if stoprule == 'bounds':
+        diff = uppershift - lowershift
+    else:
+        d = Vnew - V
+        diff = np.max(np.abs(d - d[0, 0]))
+
+    if relative is True:
+        Vnext = Vnew - Vnew[0, 0]
+    else:
+        Vnext = Vfinal
+
+    return(diff, Vnext, Vfinal)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Per-iteration telemetry for the solvers.
+
+The solvers in func/ take callback = None. If callback is specified, it is called once per iteration with a dict record. Records from the infinite horizon solvers contain:
+- solver: name of the solver
+- iteration: iteration number (starting at 1)
+- diff: sup-norm distance between this iteration and the last (V for VFI, pol for EGM, the distribution for distribution iterations)
+- time_s: wall time of the iteration
+- elapsed_s: wall time since the solver started
+Solvers add further entries where they are available (for example polchanges in the discrete solver and numevals in the batched continuous solver). Solve back functions give one record per period.
+
+Records only contain floats, integers, strings and None so they can be written straight to JSON.
+
+Examples:
+records, callback = getcallback_collector()
+V, pol = solvevfi_1endogstate_discrete_blocks(rewardarray, transmissionarray, beta, callback = callback)
+callback = getcallback_jsonl('vfi.jsonl', extrainfo = {'ns1': 1000})
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+# Callbacks:{{{1
+def getcallback_collector():
+    """
+    Return an empty list and a callback which appends each record to the list.
+    """
+    records = []
+
+    return(records, records.append)
+
+
+def getcallback_jsonl(filename, extrainfo = None):
+    """
+    Return a callback which appends each record to filename as one line of JSON.
+    extrainfo: dict added to every record (for example the calibration or grid size)
+    The file is opened and closed for every record so the output can be read while the solver is running.
+    """
+    import json
+
+    def callback(record):
+        if extrainfo is not None:
+            record = dict(record, **extrainfo)
+        with open(filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    return(callback)
+
+
+def combinecallbacks(callbacklist):
+    """
+    Return a callback which calls every callback in callbacklist.
+    """
+    def callback(record):
+        for thiscallback in callbacklist:
+            thiscallback(record)
+
+    return(callback)
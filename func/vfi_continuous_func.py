@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Continuous VFI with one endogenous state where the maximisation is done for every (s1, s2) at once.
+
+This mirrors solvevfi_1endogstate_continuous/vf_1endogstate_continuous_oneiteration in vfi-general. However, rather than running a scalar optimizer for each (s1, s2), run a golden-section search over all states simultaneously so each call of inputfunction evaluates the whole state space.
+inputfunction and boundfunction must therefore work on arrays. They are called with arrays of shape [ns1, ns2] for s1, s2 and s1prime.
+
+functiontype options (the same as vfi-general but with array inputs):
+- 'reward': inputfunction(s1vals, s2vals, s1primevals) returns the reward. The solver adds beta * E[V(s1prime, s2prime) | s2].
+- 'value-betaEV': inputfunction(betaEVfunc, s1vals, s2vals, s1primevals) returns the value. betaEVfunc(s1primevals) returns beta * E[V(s1prime, s2prime) | s2] for the s2 of each state.
+- 'value-full': inputfunction(beta, Vfunc, nextperiodprobs, s1vals, s2vals, s1primevals) returns the value. Vfunc(s1primevals) returns V(s1prime, s2prime) with shape [ns1, ns2, ns2prime] and nextperiodprobs has shape [1, ns2, ns2prime] so E[V] = np.sum(Vfunc(s1primevals) * nextperiodprobs, axis = 2).
+- 'value-CE': inputfunction(beta, CEfunc, s1vals, s2vals, s1primevals) returns the value. CEfunc(s1primevals) returns the certainty equivalent (E[V(s1prime, s2prime)^(1 - rra) | s2])^(1 / (1 - rra)) for the s2 of each state. This is for Epstein-Zin preferences: E[V(s1prime, s2prime)^(1 - rra) | s2] is computed at every point of endogstatevec once per iteration so each evaluation is a single 1-D interpolation rather than interpolating V for every s2prime (see epsteinzin_vec_func.py for the time aggregator). Requires V > 0.
+
+V is interpolated between points in endogstatevec using interp_func.py and s1prime is restricted to lie within endogstatevec. interpmethod gives the method ('linear' by default, 'pchip' or 'schumaker'). The grid is inspected once (so the interval containing s1prime is found by arithmetic on uniform and log-uniform grids) and the coefficients are computed once per iteration rather than on every evaluation.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# imported once here rather than in vf_1endogstate_continuous_oneiteration_batch which runs every iteration
+sys.path.append(str(__projectdir__ / Path('func/')))
+from epsteinzin_vec_func import getcertaintyequivalent_frommoment
+from epsteinzin_vec_func import getriskmoment
+from interp_func import evalinterpolant_allcolumns
+from interp_func import evalinterpolant_owncolumn
+from interp_func import getgridinfo
+from interp_func import getinterpolant
+from stoprule_func import applystoprule
+from stoprule_func import checkstoprule
+
+# Golden Section:{{{1
+def goldensection_batch(objective, low, high, tol = 1e-8):
+    """
+    Maximise objective(x) separately for every element of x where x lies in [low, high] elementwise.
+    objective takes an array of the same shape as low and returns an array of the same shape.
+    Every element uses the same number of steps so each step is a single call of objective.
+    Like scipy.optimize.fminbound, this assumes the objective is unimodal within the bounds.
+    Returns the maximiser, the maximum and the number of objective evaluations.
+    """
+    invphi = (np.sqrt(5) - 1) / 2
+
+    a = np.array(low, dtype = float)
+    b = np.array(high, dtype = float)
+    c = b - invphi * (b - a)
+    d = a + invphi * (b - a)
+    fc = objective(c)
+    fd = objective(d)
+    numevals = 2
+
+    maxwidth = np.max(b - a)
+    if maxwidth > tol:
+        numsteps = int(np.ceil(np.log(tol / maxwidth) / np.log(invphi)))
+    else:
+        numsteps = 0
+
+    for stepi in range(numsteps):
+        # if fc > fd then the maximum is in [a, d] otherwise it is in [c, b]
+        left = fc > fd
+        a = np.where(left, a, c)
+        b = np.where(left, d, b)
+
+        # left: old c becomes the new d and need a new c. right: old d becomes the new c and need a new d.
+        xnew = np.where(left, b - invphi * (b - a), a + invphi * (b - a))
+        fnew = objective(xnew)
+        numevals = numevals + 1
+
+        c, d = np.where(left, xnew, d), np.where(left, c, xnew)
+        fc, fd = np.where(left, fnew, fd), np.where(left, fc, fnew)
+
+    x = np.where(fc > fd, c, d)
+    fx = np.where(fc > fd, fc, fd)
+
+    return(x, fx, numevals)
+
+
+# One Iteration:{{{1
+def getbounds_batch(boundfunction, s1vals, s2vals, endogstates_future):
+    """
+    Get the lower and upper bounds on s1prime for every state.
+    s1prime is always restricted to lie within endogstates_future since V is only known there.
+    """
+    s1low = np.full(np.shape(s1vals), endogstates_future[0])
+    s1high = np.full(np.shape(s1vals), endogstates_future[-1])
+    if boundfunction is not None:
+        s1low_bf, s1high_bf = boundfunction(s1vals, s2vals)
+        if s1low_bf is not None:
+            s1low = np.clip(s1low_bf, endogstates_future[0], endogstates_future[-1])
+        if s1high_bf is not None:
+            s1high = np.clip(s1high_bf, endogstates_future[0], endogstates_future[-1])
+    s1high = np.maximum(s1low, s1high)
+
+    return(s1low, s1high)
+
+
+def vf_1endogstate_continuous_oneiteration_batch(inputfunction, Vprime, endogstates_now, endogstates_future, exogstates_now, exogstates_future, transmissionarray, beta, functiontype = 'reward', boundfunction = None, tol = 1e-8, returnnumevals = False, rra = None, interpmethod = 'linear', gridinfo_future = None):
+    """
+    Compute V[s1, s2] and pol[s1, s2] given next period's value function Vprime[s1prime, s2prime] by maximising over all states simultaneously.
+    returnnumevals: also return the number of calls of inputfunction
+    rra: relative risk aversion used in the certainty equivalent (only needed with functiontype = 'value-CE')
+    interpmethod: method used to interpolate over endogstates_future (see interp_func.py)
+    gridinfo_future: getgridinfo(endogstates_future) if it has already been computed
+    """
+    endogstates_now = np.asarray(endogstates_now, dtype = float)
+    endogstates_future = np.asarray(endogstates_future, dtype = float)
+    exogstates_now = np.asarray(exogstates_now, dtype = float)
+    transmissionarray = np.asarray(transmissionarray, dtype = float)
+    Vprime = np.asarray(Vprime, dtype = float)
+    if gridinfo_future is None:
+        gridinfo_future = getgridinfo(endogstates_future)
+
+    s1vals = endogstates_now[:, np.newaxis] * np.ones([1, len(exogstates_now)])
+    s2vals = np.ones([len(endogstates_now), 1]) * exogstates_now[np.newaxis, :]
+
+    if functiontype == 'reward' or functiontype == 'value-betaEV':
+        # betaEV[s1prime, s2]
+        betaEVtable = beta * np.dot(Vprime, np.transpose(transmissionarray))
+        betaEVinterpolant = getinterpolant(gridinfo_future, betaEVtable, method = interpmethod)
+
+        def betaEVfunc(s1primevals):
+            return(evalinterpolant_owncolumn(betaEVinterpolant, s1primevals))
+
+        if functiontype == 'reward':
+            def objective(s1primevals):
+                return(inputfunction(s1vals, s2vals, s1primevals) + betaEVfunc(s1primevals))
+        else:
+            def objective(s1primevals):
+                return(inputfunction(betaEVfunc, s1vals, s2vals, s1primevals))
+    elif functiontype == 'value-full':
+        nextperiodprobs = transmissionarray[np.newaxis, :, :]
+        Vinterpolant = getinterpolant(gridinfo_future, Vprime, method = interpmethod)
+
+        def Vfunc(s1primevals):
+            return(evalinterpolant_allcolumns(Vinterpolant, s1primevals))
+
+        def objective(s1primevals):
+            return(inputfunction(beta, Vfunc, nextperiodprobs, s1vals, s2vals, s1primevals))
+    elif functiontype == 'value-CE':
+        if rra is None:
+            raise ValueError('rra must be specified with functiontype = value-CE.')
+
+        # interpolate M[s1prime, s2] = E[Vprime^(1 - rra) | s2] rather than the certainty equivalent itself so that the interpolation matches the CRRA case when rra = invies
+        Mtable = np.transpose(getriskmoment(Vprime, transmissionarray, rra))
+        Minterpolant = getinterpolant(gridinfo_future, Mtable, method = interpmethod)
+
+        def CEfunc(s1primevals):
+            return(getcertaintyequivalent_frommoment(evalinterpolant_owncolumn(Minterpolant, s1primevals), rra))
+
+        def objective(s1primevals):
+            return(inputfunction(beta, CEfunc, s1vals, s2vals, s1primevals))
+    else:
+        raise ValueError('functiontype incorrect: ' + str(functiontype))
+
+    s1low, s1high = getbounds_batch(boundfunction, s1vals, s2vals, endogstates_future)
+    pol, V, numevals = goldensection_batch(objective, s1low, s1high, tol = tol)
+
+    if returnnumevals is True:
+        return(V, pol, numevals)
+    else:
+        return(V, pol)
+
+
+# Solve:{{{1
+def solvevfi_1endogstate_continuous_batch(inputfunction, endogstatevec, exogstatevec, transmissionarray, beta, functiontype = 'reward', boundfunction = None, crit = 1e-6, printinfo = False, Vguess = None, maxiter = None, tol = 1e-8, rra = None, callback = None, stoprule = 'supnorm', relative = False, interpmethod = 'linear'):
+    """
+    Solve the infinite horizon problem maximising over every (s1, s2) at once in each iteration.
+
+    Vguess: initial guess of V[s1, s2] (zeros by default or ones with functiontype = 'value-CE' since the certainty equivalent needs V > 0)
+    tol: tolerance of the golden-section search over s1prime
+    rra: relative risk aversion for functiontype = 'value-CE'
+    callback: function called with a record after every iteration (see telemetry_func.py). Records also contain polchange (the largest absolute change in the policy function) and numevals (the number of calls of inputfunction in the iteration).
+    stoprule: 'supnorm' or 'bounds' (MacQueen-Porteus bounds - see stoprule_func.py)
+    relative: relative value iteration i.e. subtract V[0, 0] from V every iteration
+    interpmethod: 'linear', 'pchip' or 'schumaker' (see interp_func.py)
+    stoprule = 'bounds' and relative assume adding a constant to V does not change the policy function so they cannot be used with functiontype = 'value-CE' or with a value-betaEV/value-full inputfunction that is nonlinear in betaEV/V.
+    """
+    import time
+
+    checkstoprule(stoprule, relative)
+    if functiontype == 'value-CE' and (stoprule != 'supnorm' or relative is True):
+        raise ValueError('stoprule = bounds and relative are not available with functiontype = value-CE.')
+
+    ns1 = len(endogstatevec)
+    ns2 = len(exogstatevec)
+    # only inspect the grid once
+    gridinfo = getgridinfo(endogstatevec)
+
+    if Vguess is None and functiontype == 'value-CE':
+        V = np.ones([ns1, ns2])
+    elif Vguess is None:
+        V = np.zeros([ns1, ns2])
+    else:
+        V = np.array(Vguess, dtype = float)
+
+    starttime = time.time()
+    pol = None
+    iterationi = 0
+    while True:
+        iterationi = iterationi + 1
+        iterationstart = time.time()
+        polold = pol
+
+        Vnew, pol, numevals = vf_1endogstate_continuous_oneiteration_batch(inputfunction, V, endogstatevec, endogstatevec, exogstatevec, exogstatevec, transmissionarray, beta, functiontype = functiontype, boundfunction = boundfunction, tol = tol, returnnumevals = True, rra = rra, interpmethod = interpmethod, gridinfo_future = gridinfo)
+
+        diff, Vnext, Vfinal = applystoprule(Vnew, V, beta, stoprule = stoprule, relative = relative)
+        V = Vnext
+        if printinfo is True:
+            print('Iteration ' + str(iterationi) + '. Difference: ' + str(diff) + '.')
+        if callback is not None:
+            if polold is None:
+                polchange = None
+            else:
+                polchange = float(np.max(np.abs(pol - polold)))
+            callback({'solver': 'solvevfi_1endogstate_continuous_batch', 'iteration': iterationi, 'diff': float(diff), 'polchange': polchange, 'numevals': numevals, 'stoprule': stoprule, 'relative': relative, 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+
+        if diff < crit:
+            V = Vfinal
+            break
+        if maxiter is not None and iterationi >= maxiter:
+            raise ValueError('VFI did not converge after ' + str(maxiter) + ' iterations.')
+
+    return(V, pol)
@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+Discrete VFI with one endogenous state which evaluates the Bellman update in blocks of s1.
+
+This mirrors solvevfi_1endogstate_discrete/vf_1endogstate_discrete_oneiteration in vfi-general but rewardsource can either be:
+- a full rewardarray[s1, s2, s1prime]
+- a function rewardfunction(s1start, s1end) which returns rewardarray[s1start: s1end] (see getrewardfunction_1endogstate in reward_func.py)
+
+When rewardsource is a function, the full rewardarray is never created. Only one block of size blocksize * ns2 * ns1prime exists at a time so memory is O(blocksize * ns1) rather than O(ns1^2 * ns2).
+rewardsource can also be a memory-mapped rewardarray (np.memmap, for example from getrewardarray_1endogstate_memmap in reward_func.py) for problems where the rewardarray does not fit in memory. The file is swept in sequential blocks of s1 which are read with ordinary file reads (see getrewardblock) so memory stays O(blocksize * ns1) and the file can be reused by later solves. If blocksize is not given, blocks of about memmapblockbytes are used.
+Each block is maximised with exactly the same operations as the full array so the results do not depend upon blocksize.
+With workers, the blocks are maximised on a pool of threads. NumPy releases the GIL in the addition, max and argmax over s1prime so the blocks run in parallel. Each block writes to its own rows of V and pol so the results are identical to the serial results.
+
+Reduced precision (precision = 'float32' in solvevfi_1endogstate_discrete_blocks): the rewardarray (see the dtype option in reward_func.py), V and the continuation value are float32 and pol uses the smallest integer type that can hold every index (uint16 or int32, see getpoldtype). This halves the memory of the rewardarray and of each block in the maximisation. Once the float32 iterations converge to crit_float32, a float64 polishing pass continues from the float32 V until the usual crit so the converged policy function matches the float64 solution.
+"""
+import os
+from pathlib import Path
+import sys
+
+__projectdir__ = Path(os.path.dirname(os.path.realpath(__file__)) + '/../')
+
+import numpy as np
+
+# imported once here rather than in the functions since getcontinuation, getV_maximised and policyevaluation_solve run every iteration
+sys.path.append(str(__projectdir__ / Path('func/')))
+from dist_func import gentransmissionstararray_1endogstate_discrete_sparse
+from epsteinzin_vec_func import getcontinuation_epsteinzin
+from epsteinzin_vec_func import getV_epsteinzin
+from stoprule_func import applystoprule
+from stoprule_func import checkstoprule
+
+# Reward Blocks:{{{1
+# default size of the blocks read from a memory-mapped rewardarray
+memmapblockbytes = 3.2e7
+
+def isfilememmap(rewardsource):
+    """
+    True if rewardsource is a whole C-contiguous memory-mapped array (rather than a view of one) so its rows can be read directly from the file.
+    """
+    import mmap
+
+    return(isinstance(rewardsource, np.memmap) and isinstance(rewardsource.base, mmap.mmap) and rewardsource.flags.c_contiguous and rewardsource.filename is not None)
+
+
+def getrewardblock(rewardsource, s1start, s1end):
+    """
+    Return rewardarray[s1start: s1end] whether rewardsource is an array or a function.
+    A whole memory-mapped rewardarray is read from its file with an ordinary read rather than through the map. Pages read through the map count towards the resident memory of the process for as long as the map is open, whereas this only uses memory for the block.
+    """
+    if callable(rewardsource):
+        return(rewardsource(s1start, s1end))
+    elif isfilememmap(rewardsource):
+        rowshape = np.shape(rewardsource)[1:]
+        rowsize = int(np.prod(rowshape))
+        block = np.fromfile(rewardsource.filename, dtype = rewardsource.dtype, count = (s1end - s1start) * rowsize, offset = rewardsource.offset + s1start * rowsize * rewardsource.itemsize)
+        return(block.reshape((s1end - s1start,) + tuple(rowshape)))
+    else:
+        return(rewardsource[s1start: s1end])
+
+
+def getblocksize_rewardsource(rewardsource, ns1, blocksize):
+    """
+    Return blocksize if it is specified. Otherwise ns1 (all s1 at once) unless rewardsource is memory-mapped in which case use blocks of about memmapblockbytes.
+    """
+    if blocksize is not None:
+        return(blocksize)
+    if isinstance(rewardsource, np.memmap):
+        rowbytes = int(np.prod(np.shape(rewardsource)[1:])) * rewardsource.itemsize
+        # the maximisation creates a few temporary arrays the size of the block
+        return(int(max(1, min(ns1, memmapblockbytes // rowbytes))))
+    return(ns1)
+
+
+def getns1_rewardsource(rewardsource, ns1):
+    """
+    Get the number of current endogenous states.
+    If rewardsource is an array we can read this from the array. Otherwise need ns1 to be specified.
+    """
+    if callable(rewardsource):
+        if ns1 is None:
+            raise ValueError('Need to specify ns1 when rewardsource is a function.')
+        return(ns1)
+    else:
+        return(np.shape(rewardsource)[0])
+
+
+def getpoldtype(ns1prime):
+    """
+    Smallest integer type for pol when solving in reduced precision: uint16 if every index of s1prime fits and int32 otherwise.
+    """
+    if ns1prime <= np.iinfo(np.uint16).max + 1:
+        return(np.uint16)
+    else:
+        return(np.int32)
+
+
+# Continuation Value:{{{1
+def getcontinuation(Vprime, transmissionarray, beta, epsteinzin = None):
+    """
+    Return the continuation value[s2, s1prime] which is added to the reward in the maximisation.
+    Standard case: beta * E[Vprime[s1prime, s2prime] | s2].
+    epsteinzin = (rra, invies): beta / (1 - beta) * g(CE[s2, s1prime]) (see epsteinzin_vec_func.py). Then rewardarray should be g(c) i.e. getrewardarray_1endogstate with utility = 'crra' and rra = invies.
+    """
+    if epsteinzin is None:
+        return(beta * np.dot(transmissionarray, np.transpose(Vprime)))
+    else:
+        return(getcontinuation_epsteinzin(Vprime, transmissionarray, beta, epsteinzin[0], epsteinzin[1]))
+
+
+def getV_maximised(W, beta, epsteinzin = None):
+    """
+    Convert the maximised reward plus continuation value into V. This only changes anything in the Epstein-Zin case.
+    """
+    if epsteinzin is None:
+        return(W)
+    else:
+        return(getV_epsteinzin(W, beta, epsteinzin[1]))
+
+
+# Search:{{{1
+def search_hillclimb(valfunc, s1index, s2index, kstart, klow, khigh, climbdown = True):
+    """
+    For every state (s1index[i], s2index[i]) find the maximum of valfunc over s1prime in [klow[i], khigh[i]] by starting at kstart[i] and moving one s1prime at a time in the direction that increases the value.
+    Moving stops as soon as the value stops increasing which is only the maximum if the value is single-peaked (concave) in s1prime.
+    All states are moved together so each step is one vectorized evaluation.
+    climbdown: also try moving down from kstart (not needed if kstart is a lower bound for the policy function).
+    """
+    k = np.array(kstart)
+    v = valfunc(s1index, s2index, k)
+
+    # move up while the value strictly increases
+    movedup = np.zeros(len(k), dtype = bool)
+    active = np.where(k < khigh)[0]
+    while len(active) > 0:
+        vup = valfunc(s1index[active], s2index[active], k[active] + 1)
+        better = vup > v[active]
+        active = active[better]
+        k[active] = k[active] + 1
+        v[active] = vup[better]
+        movedup[active] = True
+        active = active[k[active] < khigh[active]]
+
+    # move down while the value weakly increases (so we return the first maximum like np.argmax)
+    if climbdown is True:
+        active = np.where((~movedup) & (k > klow))[0]
+        while len(active) > 0:
+            vdown = valfunc(s1index[active], s2index[active], k[active] - 1)
+            better = vdown >= v[active]
+            active = active[better]
+            k[active] = k[active] - 1
+            v[active] = vdown[better]
+            active = active[k[active] > klow[active]]
+
+    return(k, v)
+
+
+def search_segmentargmax(valfunc, s1index, s2index, klow, khigh):
+    """
+    For every state (s1index[i], s2index[i]) find the first maximum of valfunc over s1prime in [klow[i], khigh[i]] by checking every s1prime in the range.
+    All ranges are flattened into one vector so this is a single vectorized evaluation.
+    """
+    lengths = khigh - klow + 1
+    offsets = np.concatenate([[0], np.cumsum(lengths)[: -1]])
+    numcandidates = np.sum(lengths)
+
+    # s1prime for each candidate
+    k_flat = np.arange(numcandidates) - np.repeat(offsets, lengths) + np.repeat(klow, lengths)
+    vals = valfunc(np.repeat(s1index, lengths), np.repeat(s2index, lengths), k_flat)
+
+    segmax = np.maximum.reduceat(vals, offsets)
+    ismax = vals == np.repeat(segmax, lengths)
+    firstpos = np.minimum.reduceat(np.where(ismax, np.arange(numcandidates), numcandidates), offsets)
+
+    return(k_flat[firstpos], vals[firstpos])
+
+
+def search_monotone(valfunc, ns1, ns2, ns1prime, concave = False, polguess = None):
+    """
+    Find the policy function using divide and conquer assuming pol[s1, s2] is weakly increasing in s1.
+    Solve for the middle s1 first. Then lower s1 only need to consider s1prime at or below that policy and higher s1 only need to consider s1prime at or above that policy.
+    Every interval at the same level of the recursion is solved together in one vectorized step so there are about log2(ns1) steps in total and O(ns1 * ns2) work per step.
+    concave: within each interval, start at polguess (clipped to the bounds of the interval) or the lower bound and move in the direction that increases the value, stopping once the value falls rather than checking every s1prime.
+    """
+    V = np.empty([ns1, ns2])
+    pol = np.empty([ns1, ns2], dtype = int)
+
+    # intervals of s1 still to solve with the bounds on their policy functions
+    s2index = np.arange(ns2)
+    s1low = np.zeros(ns2, dtype = int)
+    s1high = np.full(ns2, ns1 - 1)
+    klow = np.zeros(ns2, dtype = int)
+    khigh = np.full(ns2, ns1prime - 1)
+
+    while len(s2index) > 0:
+        s1mid = (s1low + s1high) // 2
+        if concave is True:
+            if polguess is None:
+                kstar, vstar = search_hillclimb(valfunc, s1mid, s2index, klow, klow, khigh, climbdown = False)
+            else:
+                kstart = np.clip(polguess[s1mid, s2index], klow, khigh)
+                kstar, vstar = search_hillclimb(valfunc, s1mid, s2index, kstart, klow, khigh)
+        else:
+            kstar, vstar = search_segmentargmax(valfunc, s1mid, s2index, klow, khigh)
+        pol[s1mid, s2index] = kstar
+        V[s1mid, s2index] = vstar
+
+        # split each interval into the part below s1mid and the part above s1mid
+        left = s1low <= s1mid - 1
+        right = s1mid + 1 <= s1high
+        s2index, s1low, s1high, klow, khigh = [np.concatenate(x) for x in [(s2index[left], s2index[right]), (s1low[left], s1mid[right] + 1), (s1mid[left] - 1, s1high[right]), (klow[left], kstar[right]), (kstar[left], khigh[right])]]
+
+    return(V, pol)
+
+
+# One Iteration:{{{1
+def vf_1endogstate_discrete_oneiteration_blocks(rewardsource, Vprime, transmissionarray, beta, ns1 = None, blocksize = None, returnrewardpol = False, search = 'brute', polguess = None, validate = False, epsteinzin = None, dtype = None, workers = None):
+    """
+    Compute V[s1, s2] = max_s1prime rewardarray[s1, s2, s1prime] + beta * E[Vprime[s1prime, s2prime] | s2].
+
+    Vprime has shape [ns1prime, ns2prime] and transmissionarray has shape [ns2, ns2prime].
+    blocksize is the number of values of s1 considered at once. If blocksize is None, consider all s1 at once (or blocks of about memmapblockbytes if rewardsource is memory-mapped).
+    returnrewardpol: also return rewardpol[s1, s2] = rewardarray[s1, s2, pol[s1, s2]] (needed for policy evaluation)
+
+    search: how to find the maximum over s1prime
+    - 'brute': check every s1prime (always correct)
+    - 'monotone': divide and conquer assuming pol[s1, s2] is weakly increasing in s1
+    - 'concave': start at polguess (or s1prime = 0) and move in the direction that increases the value, stopping once the value falls. Assumes the value is single-peaked in s1prime.
+    - 'monotone-concave': divide and conquer where each interval is searched from polguess (or its lower bound), stopping once the value falls
+    Only 'brute' works when rewardsource is a function and blocksize is ignored for the other methods.
+    polguess: starting point for 'concave' and 'monotone-concave' (usually pol from the previous iteration)
+    validate: also solve by brute force and raise an error if the policy functions differ (only use on small grids)
+    epsteinzin: (rra, invies) to solve with Epstein-Zin preferences (see getcontinuation). The certainty equivalent is computed once as an array so there is no per-cell callback.
+    dtype: float type of the maximisation, V and rewardpol (np.float64 by default). With np.float32, blocks of rewardsource are converted to float32 if necessary and pol uses getpoldtype.
+    workers: maximise the blocks on this many threads (only with search = 'brute'). If blocksize is None, the s1 are split into workers blocks (or blocks of about memmapblockbytes if rewardsource is memory-mapped).
+    """
+    if search != 'brute':
+        return(vf_1endogstate_discrete_oneiteration_search(rewardsource, Vprime, transmissionarray, beta, returnrewardpol = returnrewardpol, search = search, polguess = polguess, validate = validate, epsteinzin = epsteinzin, dtype = dtype))
+
+    ns1 = getns1_rewardsource(rewardsource, ns1)
+    ns2 = np.shape(transmissionarray)[0]
+    if blocksize is None and workers is not None and not isinstance(rewardsource, np.memmap):
+        blocksize = int(np.ceil(ns1 / workers))
+    blocksize = getblocksize_rewardsource(rewardsource, ns1, blocksize)
+    if dtype is None:
+        dtype = np.float64
+
+    # betaEV[s2, s1prime]
+    betaEV = getcontinuation(Vprime, transmissionarray, beta, epsteinzin = epsteinzin).astype(dtype, copy = False)
+    if dtype == np.float64:
+        poldtype = int
+    else:
+        poldtype = getpoldtype(np.shape(betaEV)[1])
+
+    V = np.empty([ns1, ns2], dtype = dtype)
+    pol = np.empty([ns1, ns2], dtype = poldtype)
+    if returnrewardpol is True:
+        rewardpol = np.empty([ns1, ns2], dtype = dtype)
+
+    def maximiseblock(s1start):
+        s1end = min(s1start + blocksize, ns1)
+
+        rewardblock = np.asarray(getrewardblock(rewardsource, s1start, s1end), dtype = dtype)
+        valarray = rewardblock + betaEV[np.newaxis, :, :]
+        polblock = np.argmax(valarray, axis = 2)
+
+        pol[s1start: s1end] = polblock
+        V[s1start: s1end] = np.take_along_axis(valarray, polblock[:, :, np.newaxis], axis = 2)[:, :, 0]
+        if returnrewardpol is True:
+            rewardpol[s1start: s1end] = np.take_along_axis(rewardblock, polblock[:, :, np.newaxis], axis = 2)[:, :, 0]
+
+    if workers is None or workers == 1:
+        for s1start in range(0, ns1, blocksize):
+            maximiseblock(s1start)
+    else:
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+            # list() raises any exception from the threads
+            list(executor.map(maximiseblock, range(0, ns1, blocksize)))
+
+    V = getV_maximised(V, beta, epsteinzin = epsteinzin).astype(dtype, copy = False)
+
+    if returnrewardpol is True:
+        return(V, pol, rewardpol)
+    else:
+        return(V, pol)
+
+
+def vf_1endogstate_discrete_oneiteration_search(rewardarray, Vprime, transmissionarray, beta, returnrewardpol = False, search = 'monotone', polguess = None, validate = False, epsteinzin = None, dtype = None):
+    """
+    Same as vf_1endogstate_discrete_oneiteration_blocks but use monotonicity of the policy function and/or concavity of the value in s1prime to avoid checking every s1prime.
+    """
+    if callable(rewardarray):
+        raise ValueError('search = ' + str(search) + ' requires rewardsource to be an array.')
+
+    ns1, ns2, ns1prime = np.shape(rewardarray)
+    if dtype is None:
+        dtype = np.float64
+
+    # betaEV[s2, s1prime]
+    betaEV = getcontinuation(Vprime, transmissionarray, beta, epsteinzin = epsteinzin).astype(dtype, copy = False)
+
+    def valfunc(s1index, s2index, s1primeindex):
+        return(rewardarray[s1index, s2index, s1primeindex] + betaEV[s2index, s1primeindex])
+
+    if search == 'monotone':
+        V, pol = search_monotone(valfunc, ns1, ns2, ns1prime, concave = False)
+    elif search == 'monotone-concave':
+        V, pol = search_monotone(valfunc, ns1, ns2, ns1prime, concave = True, polguess = polguess)
+    elif search == 'concave':
+        s1index = np.repeat(np.arange(ns1), ns2)
+        s2index = np.tile(np.arange(ns2), ns1)
+        if polguess is None:
+            kstart = np.zeros(ns1 * ns2, dtype = int)
+        else:
+            kstart = np.array(polguess, dtype = int).reshape(-1)
+        klow = np.zeros(ns1 * ns2, dtype = int)
+        khigh = np.full(ns1 * ns2, ns1prime - 1)
+        k, v = search_hillclimb(valfunc, s1index, s2index, kstart, klow, khigh)
+        V = v.reshape([ns1, ns2])
+        pol = k.reshape([ns1, ns2])
+    else:
+        raise ValueError('search incorrect: ' + str(search))
+
+    V = getV_maximised(V, beta, epsteinzin = epsteinzin).astype(dtype, copy = False)
+    if dtype != np.float64:
+        pol = pol.astype(getpoldtype(ns1prime))
+
+    if validate is True:
+        V_brute, pol_brute = vf_1endogstate_discrete_oneiteration_blocks(rewardarray, Vprime, transmissionarray, beta, epsteinzin = epsteinzin, dtype = dtype)
+        if np.any(pol != pol_brute):
+            raise ValueError('search = ' + str(search) + ' yields a different policy function to brute force search at ' + str(np.sum(pol != pol_brute)) + ' states.')
+
+    if returnrewardpol is True:
+        rewardpol = np.take_along_axis(rewardarray, pol[:, :, np.newaxis].astype(np.intp), axis = 2)[:, :, 0].astype(dtype, copy = False)
+        return(V, pol, rewardpol)
+    else:
+        return(V, pol)
+
+
+# Policy Evaluation:{{{1
+def policyevaluation_iterate(V, pol, rewardpol, transmissionarray, beta, numsweeps, epsteinzin = None):
+    """
+    Apply V[s1, s2] = rewardpol[s1, s2] + beta * E[V[pol[s1, s2], s2prime] | s2] numsweeps times holding the policy function fixed (or the Epstein-Zin equivalent).
+    Each sweep is O(ns1 * ns2 * ns2) rather than the O(ns1 * ns1 * ns2) of a maximisation step.
+    """
+    ns2 = np.shape(transmissionarray)[0]
+    s2index = np.arange(ns2)[np.newaxis, :]
+    for sweepi in range(numsweeps):
+        # betaEV[s2, s1prime]
+        betaEV = getcontinuation(V, transmissionarray, beta, epsteinzin = epsteinzin).astype(V.dtype, copy = False)
+        V = getV_maximised(rewardpol + betaEV[s2index, pol], beta, epsteinzin = epsteinzin).astype(V.dtype, copy = False)
+
+    return(V)
+
+
+def policyevaluation_solve(pol, rewardpol, transmissionarray, beta):
+    """
+    Solve for the value of following pol forever exactly i.e. solve (I - beta * Q) v = rewardpol where Q is the sparse transition matrix over (s1, s2) implied by pol.
+    States are ordered s1 * ns2 + s2.
+    """
+    import scipy.sparse
+    import scipy.sparse.linalg
+
+    ns1, ns2 = np.shape(pol)
+
+    Q = gentransmissionstararray_1endogstate_discrete_sparse(transmissionarray, pol)
+
+    A = scipy.sparse.identity(ns1 * ns2, format = 'csr') - beta * Q
+    v = scipy.sparse.linalg.spsolve(A.tocsc(), rewardpol.reshape(-1))
+
+    return(v.reshape([ns1, ns2]).astype(rewardpol.dtype, copy = False))
+
+
+# Solve:{{{1
+def solvevfi_1endogstate_discrete_blocks(rewardsource, transmissionarray, beta, ns1 = None, blocksize = None, crit = 1e-6, printinfo = False, Vguess = None, maxiter = None, howard = None, search = 'brute', validate = False, epsteinzin = None, callback = None, stoprule = 'supnorm', relative = False, precision = 'float64', crit_float32 = 1e-4, polish = True, polishsource = None, workers = None):
+    """
+    Solve the infinite horizon problem with rewardsource given in blocks of s1.
+
+    rewardsource: rewardarray[s1, s2, s1prime] (possibly memory-mapped) or a function rewardfunction(s1start, s1end) returning rewardarray[s1start: s1end]
+    ns1: number of endogenous states (only needed if rewardsource is a function)
+    blocksize: number of values of s1 considered at once (by default all of them or blocks of about memmapblockbytes if rewardsource is memory-mapped)
+    Vguess: initial guess of V[s1, s2] (zeros by default or ones with epsteinzin since the certainty equivalent needs V > 0)
+    maxiter: stop with an error after this many maximisation steps
+    howard: policy evaluation between maximisation steps (Howard improvement/modified policy iteration)
+    - None: standard VFI
+    - an integer k: after each maximisation step, do k cheap policy evaluation sweeps using the policy function from the maximisation step
+    - 'solve': after each maximisation step, solve for the value of following the policy function forever with a sparse linear solve
+
+    search: how to find the maximum over s1prime ('brute', 'monotone', 'concave' or 'monotone-concave' - see vf_1endogstate_discrete_oneiteration_blocks). With 'concave', the search in each iteration starts from the policy function of the previous iteration.
+    validate: check the policy function from search against brute force search in every iteration (only use on small grids)
+    Note that with howard, V in intermediate iterations need not be concave so 'concave' can find a local maximum in an intermediate iteration (which validate would flag). The maximisation step at convergence still needs to be correct so check the final policy function against 'brute' on a small grid.
+
+    epsteinzin: (rra, invies) to solve with Epstein-Zin preferences. rewardsource should then give g(c) = c^(1 - invies) / (1 - invies) (see getcontinuation). howard = 'solve' is not available since Epstein-Zin policy evaluation is nonlinear.
+
+    callback: function called with a record after every maximisation step (see telemetry_func.py). Records also contain polchanges (the number of states where the policy function changed), howardsweeps (the total policy evaluation sweeps so far) and search.
+
+    stoprule: 'supnorm' stops when the change in V from a maximisation step is below crit. 'bounds' stops when the gap between the MacQueen-Porteus bounds on V* is below crit and moves V to the middle of the bounds every iteration (see stoprule_func.py). 'bounds' usually needs far fewer iterations.
+    relative: relative value iteration i.e. subtract V[0, 0] from V every iteration. V* is recovered from the MacQueen-Porteus bounds at the end.
+
+    Convergence is always judged on the change in V from a maximisation step so the stopping rule is the same with and without howard.
+
+    precision: 'float64' or 'float32'. With 'float32', iterate in float32 until the difference is below max(crit, crit_float32) or has not fallen for 5 iterations (float32 rounding means crit itself may not be reachable) and then, if polish is True, run a float64 polishing pass from the float32 V with the same options until the difference is below crit. pol is returned with dtype getpoldtype(ns1prime).
+    polishsource: rewardsource for the float64 polishing pass (by default rewardsource with each block converted to float64). If rewardsource is a float32 rewardarray, use a float64 rewardfunction here so the polishing pass uses the exact rewards without creating a float64 rewardarray. The polishing pass uses search = 'brute' if polishsource is a function.
+    workers: number of threads used in each maximisation step (see vf_1endogstate_discrete_oneiteration_blocks). The results are the same for any number of workers.
+    """
+    import time
+
+    if precision == 'float32' and polish is True:
+        # ns1 is needed if polishsource is a function
+        ns1 = getns1_rewardsource(rewardsource, ns1)
+        # keep the blocks of a memory-mapped rewardsource in the polishing pass
+        options = {'ns1': ns1, 'blocksize': getblocksize_rewardsource(rewardsource, ns1, blocksize), 'printinfo': printinfo, 'maxiter': maxiter, 'howard': howard, 'search': search, 'validate': validate, 'epsteinzin': epsteinzin, 'callback': callback, 'stoprule': stoprule, 'relative': relative, 'workers': workers}
+        V32, pol32 = solvevfi_1endogstate_discrete_blocks(rewardsource, transmissionarray, beta, crit = crit, Vguess = Vguess, precision = 'float32', crit_float32 = crit_float32, polish = False, **options)
+        if printinfo is True:
+            print('float32 iterations converged. Polishing in float64.')
+        if polishsource is None:
+            polishsource = rewardsource
+        if callable(polishsource):
+            # the other search methods need an array
+            options['search'] = 'brute'
+        V, pol = solvevfi_1endogstate_discrete_blocks(polishsource, transmissionarray, beta, crit = crit, Vguess = V32.astype(np.float64), **options)
+        return(V, pol.astype(pol32.dtype))
+    elif precision == 'float32':
+        dtype = np.float32
+        crit = max(crit, crit_float32)
+    elif precision == 'float64':
+        dtype = np.float64
+    else:
+        raise ValueError('precision incorrect: ' + str(precision))
+
+    ns1 = getns1_rewardsource(rewardsource, ns1)
+    ns2 = np.shape(transmissionarray)[0]
+
+    if howard is not None and howard != 'solve' and not (isinstance(howard, int) and howard >= 0):
+        raise ValueError('howard should be None, a non-negative integer or solve.')
+    if howard == 'solve' and epsteinzin is not None:
+        raise ValueError('howard = solve is not available with epsteinzin.')
+    checkstoprule(stoprule, relative)
+    if epsteinzin is not None and (stoprule != 'supnorm' or relative is True):
+        raise ValueError('stoprule = bounds and relative are not available with epsteinzin.')
+
+    if Vguess is None and epsteinzin is not None:
+        V = np.ones([ns1, ns2], dtype = dtype)
+    elif Vguess is None:
+        V = np.zeros([ns1, ns2], dtype = dtype)
+    else:
+        V = np.array(Vguess, dtype = dtype)
+
+    starttime = time.time()
+    numsweeps = 0
+    pol = None
+    # for detecting when float32 iterations stop improving
+    mindiff = np.inf
+    numstalled = 0
+    iterationi = 0
+    while True:
+        iterationi = iterationi + 1
+        iterationstart = time.time()
+        polold = pol
+
+        if howard is None:
+            Vnew, pol = vf_1endogstate_discrete_oneiteration_blocks(rewardsource, V, transmissionarray, beta, ns1 = ns1, blocksize = blocksize, search = search, polguess = pol, validate = validate, epsteinzin = epsteinzin, dtype = dtype, workers = workers)
+        else:
+            Vnew, pol, rewardpol = vf_1endogstate_discrete_oneiteration_blocks(rewardsource, V, transmissionarray, beta, ns1 = ns1, blocksize = blocksize, returnrewardpol = True, search = search, polguess = pol, validate = validate, epsteinzin = epsteinzin, dtype = dtype, workers = workers)
+
+        diff, Vnext, Vfinal = applystoprule(Vnew, V, beta, stoprule = stoprule, relative = relative)
+        if printinfo is True:
+            print('Iteration ' + str(iterationi) + '. Difference: ' + str(diff) + '.')
+        if callback is not None:
+            if polold is None:
+                polchanges = None
+            else:
+                polchanges = int(np.sum(pol != polold))
+            callback({'solver': 'solvevfi_1endogstate_discrete_blocks', 'iteration': iterationi, 'diff': float(diff), 'polchanges': polchanges, 'howardsweeps': numsweeps, 'search': search, 'stoprule': stoprule, 'relative': relative, 'precision': str(np.dtype(dtype)), 'workers': workers, 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+
+        if diff < crit:
+            V = Vfinal
+            break
+        if dtype == np.float32:
+            if diff < mindiff:
+                mindiff = diff
+                numstalled = 0
+            else:
+                numstalled = numstalled + 1
+            if numstalled >= 5:
+                V = Vfinal
+                break
+        if maxiter is not None and iterationi >= maxiter:
+            raise ValueError('VFI did not converge after ' + str(maxiter) + ' iterations.')
+
+        if howard is None:
+            V = Vnext
+        elif howard == 'solve':
+            V = policyevaluation_solve(pol, rewardpol, transmissionarray, beta)
+        else:
+            V = policyevaluation_iterate(Vnext, pol, rewardpol, transmissionarray, beta, howard, epsteinzin = epsteinzin)
+            numsweeps = numsweeps + howard
+        if relative is True:
+            V = V - V[0, 0]
+
+    if printinfo is True and howard is not None:
+        if howard == 'solve':
+            print('Howard improvement: ' + str(iterationi) + ' maximisation steps and ' + str(iterationi - 1) + ' linear solves in ' + str(time.time() - starttime) + ' seconds.')
+        else:
+            print('Howard improvement: ' + str(iterationi) + ' maximisation steps and ' + str(numsweeps) + ' policy evaluation sweeps in ' + str(time.time() - starttime) + ' seconds.')
+
+    return(V, pol)
+
+
+# Parameter Batch:{{{1
+def vf_1endogstate_discrete_oneiteration_batchparam(rewardarray, Vprime, transmissionarray, beta, paramindex, blocksize = None):
+    """
+    One maximisation step for the members paramindex of a batch of models.
+
+    rewardarray: rewardarray[p, s1, s2, s1prime] or rewardarray[s1, s2, s1prime] if the reward is the same for every member
+    Vprime: Vprime[p, s1prime, s2prime] for the members in paramindex
+    transmissionarray: transmissionarray[p, s2, s2prime] or transmissionarray[s2, s2prime] if the same for every member
+    beta: beta[p]
+    paramindex: indices of the members to update
+
+    Returns V[p, s1, s2] and pol[p, s1, s2] for the members in paramindex.
+    """
+    numparam = len(paramindex)
+    ns1, ns2, ns1prime = np.shape(rewardarray)[-3: ]
+    if blocksize is None:
+        blocksize = ns1
+
+    # betaEV[p, s2, s1prime]
+    if np.ndim(transmissionarray) == 2:
+        betaEV = beta[paramindex][:, np.newaxis, np.newaxis] * np.matmul(transmissionarray, np.transpose(Vprime, (0, 2, 1)))
+    else:
+        betaEV = beta[paramindex][:, np.newaxis, np.newaxis] * np.matmul(transmissionarray[paramindex], np.transpose(Vprime, (0, 2, 1)))
+
+    V = np.empty([numparam, ns1, ns2])
+    pol = np.empty([numparam, ns1, ns2], dtype = int)
+    for s1start in range(0, ns1, blocksize):
+        s1end = min(s1start + blocksize, ns1)
+        if np.ndim(rewardarray) == 3:
+            valarray = rewardarray[np.newaxis, s1start: s1end] + betaEV[:, np.newaxis]
+        else:
+            # take makes one copy which is then added to in place
+            valarray = np.take(rewardarray[:, s1start: s1end], paramindex, axis = 0)
+            valarray += betaEV[:, np.newaxis]
+        pol[:, s1start: s1end] = np.argmax(valarray, axis = 3)
+        V[:, s1start: s1end] = np.take_along_axis(valarray, pol[:, s1start: s1end, :, np.newaxis], axis = 3)[:, :, :, 0]
+
+    return(V, pol)
+
+
+def solvevfi_1endogstate_discrete_batchparam(rewardarray, transmissionarray, beta, crit = 1e-6, printinfo = False, Vguess = None, maxiter = None, blocksize = None, callback = None):
+    """
+    Solve a batch of models which differ in their parameters (for example BETA and R) together.
+    Every iteration is one stacked computation over the members which have not yet converged. Members are frozen once their change in V is below crit so each member stops at the same iteration as if it was solved on its own with solvevfi_1endogstate_discrete_blocks.
+
+    rewardarray: rewardarray[p, s1, s2, s1prime] (for example from stacking getrewardarray_1endogstate for each R) or rewardarray[s1, s2, s1prime] if the reward is the same for every member
+    transmissionarray: transmissionarray[s2, s2prime] or transmissionarray[p, s2, s2prime]
+    beta: a float or beta[p]
+    Vguess: initial guess V[p, s1, s2] (zeros by default)
+    blocksize: number of values of s1 considered at once (bounds the memory used by the temporary arrays)
+    callback: function called with a record after every iteration (see telemetry_func.py). Records contain diff (the largest change over members which have not converged) and numactive (the number of members which had not converged at the start of the iteration).
+
+    Returns V[p, s1, s2] and pol[p, s1, s2].
+    """
+    import time
+
+    beta = np.asarray(beta, dtype = float)
+    if np.ndim(rewardarray) == 4:
+        numparam = np.shape(rewardarray)[0]
+    elif np.ndim(beta) == 1:
+        numparam = len(beta)
+    elif np.ndim(transmissionarray) == 3:
+        numparam = np.shape(transmissionarray)[0]
+    else:
+        raise ValueError('Need a parameter axis in one of rewardarray, transmissionarray or beta.')
+    if np.ndim(beta) == 0:
+        beta = np.full(numparam, float(beta))
+
+    ns1, ns2 = np.shape(rewardarray)[-3: -1]
+    if Vguess is None:
+        V = np.zeros([numparam, ns1, ns2])
+    else:
+        V = np.array(Vguess, dtype = float)
+    pol = np.zeros([numparam, ns1, ns2], dtype = int)
+
+    active = np.arange(numparam)
+    starttime = time.time()
+    iterationi = 0
+    while len(active) > 0:
+        iterationi = iterationi + 1
+        iterationstart = time.time()
+
+        Vnew, polnew = vf_1endogstate_discrete_oneiteration_batchparam(rewardarray, V[active], transmissionarray, beta, active, blocksize = blocksize)
+
+        diffs = np.max(np.abs(Vnew - V[active]), axis = (1, 2))
+        V[active] = Vnew
+        pol[active] = polnew
+        if printinfo is True:
+            print('Iteration ' + str(iterationi) + '. Difference: ' + str(np.max(diffs)) + '. Members not converged: ' + str(len(active)) + '.')
+        if callback is not None:
+            callback({'solver': 'solvevfi_1endogstate_discrete_batchparam', 'iteration': iterationi, 'diff': float(np.max(diffs)), 'numactive': len(active), 'time_s': time.time() - iterationstart, 'elapsed_s': time.time() - starttime})
+
+        active = active[diffs >= crit]
+        if maxiter is not None and iterationi >= maxiter and len(active) > 0:
+            raise ValueError('VFI did not converge after ' + str(maxiter) + ' iterations for members ' + str(list(active)) + '.')
+
+    return(V, pol)
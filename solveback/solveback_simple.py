@@ -186,17 +186,15 @@ def twoperiod_discrete_example():
     exogstate_future = [0]
     transmissionarray = np.array([[1], [1]])
 
-    ns1 = len(endogstate_now)
-    ns1prime = len(endogstate_future)
     ns2 = len(exogstate_now)
-    ns2prime = len(exogstate_future)
 
-    rewardarray = np.empty([ns1, ns2, ns1prime])
-    for s1 in range(ns1):
-        for s2 in range(ns2):
-            for s1prime in range(ns1prime):
-                C = endogstate_now[s1] * R + exogstate_now[s2] - endogstate_future[s1prime]
-                rewardarray[s1, s2, s1prime] = u(C)
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    rewardarray = getrewardarray_1endogstate(budgetfunction, endogstate_now, exogstate_now, endogstatevec_future = endogstate_future, utility = 'log', negvalue = -1e90)
 
     # get second period V
     def lastperiodutility(endogval, exogval):
@@ -232,20 +230,15 @@ def threeperiod_discrete_example(transmissionstarmethod = True):
     exogstate_list = [exogstate_startmiddle, exogstate_startmiddle, exogstate_end]
     T = len(endogstate_list)
 
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
+
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
     rewardarray_list = []
     for t in range(T - 1):
-        ns1 = len(endogstate_list[t])
-        ns1prime = len(endogstate_list[t + 1])
-        ns2 = len(exogstate_list[t])
-        ns2prime = len(exogstate_list[t + 1])
-
-        rewardarray = np.empty([ns1, ns2, ns1prime])
-        for s1 in range(ns1):
-            for s2 in range(ns2):
-                for s1prime in range(ns1prime):
-                    C = endogstate_list[t][s1] * R + exogstate_list[t][s2] - endogstate_list[t + 1][s1prime]
-                    rewardarray[s1, s2, s1prime] = u(C)
-
+        rewardarray = getrewardarray_1endogstate(budgetfunction, endogstate_list[t], exogstate_list[t], endogstatevec_future = endogstate_list[t + 1], utility = 'log', negvalue = -1e90)
         rewardarray_list.append(rewardarray)
 
     transmissionarray_list = [transmissionarray_start, transmissionarray_end]
@@ -277,7 +270,12 @@ def threeperiod_discrete_example(transmissionstarmethod = True):
 
     print(meandistlist)
 
-def manyperiod_discrete_example(T = 3, transmissionstarmethod = True):
+def manyperiod_discrete_example(T = 3, transmissionstarmethod = True, store = 'memory', streamdist = False):
+    """
+    Every period after the first has the same rewardarray so only build two rewardarrays and pass references to them rather than building T - 1 identical arrays.
+    store: 'memory' to keep V and pol for every period in memory or a directory to save them to disk (see solveback_func.py)
+    streamdist: move the distribution forwards one period at a time with dist_meanvar_solveback rather than keeping the distribution for every period (transmissionstarmethod is then ignored)
+    """
     def u(C):
         if C > 0:
             return(np.log(C))
@@ -294,24 +292,17 @@ def manyperiod_discrete_example(T = 3, transmissionstarmethod = True):
     endogstate_list = [endogstate_start] + [endogstate_middleend] * (T - 1)
     exogstate_list = [exogstate_startmiddle] * (T - 1) + [exogstate_end]
 
-    rewardarray_list = []
-    for t in range(T - 1):
-        ns1 = len(endogstate_list[t])
-        ns1prime = len(endogstate_list[t + 1])
-        ns2 = len(exogstate_list[t])
-        ns2prime = len(exogstate_list[t + 1])
-
-        rewardarray = np.empty([ns1, ns2, ns1prime])
-        for s1 in range(ns1):
-            for s2 in range(ns2):
-                for s1prime in range(ns1prime):
-                    C = endogstate_list[t][s1] * R + exogstate_list[t][s2] - endogstate_list[t + 1][s1prime]
-                    rewardarray[s1, s2, s1prime] = u(C)
+    def budgetfunction(endogstate_now, exogstate, endogstate_future):
+        C = endogstate_now * R + exogstate - endogstate_future
+        return(C)
 
-        rewardarray_list.append(rewardarray)
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from reward_func import getrewardarray_1endogstate
+    rewardarray_start = getrewardarray_1endogstate(budgetfunction, endogstate_start, exogstate_startmiddle, endogstatevec_future = endogstate_middleend, utility = 'log', negvalue = -1e90)
+    rewardarray_middle = getrewardarray_1endogstate(budgetfunction, endogstate_middleend, exogstate_startmiddle, endogstatevec_future = endogstate_middleend, utility = 'log', negvalue = -1e90)
+    rewardarray_list = [rewardarray_start] + [rewardarray_middle] * (T - 2)
 
     transmissionarray_list = [transmissionarray_middle] * (T - 2) + [transmissionarray_end]
-    beta_list = [BETA] * (T - 1)
 
     # get second period V
     def lastperiodutility(endogval, exogval):
@@ -321,17 +312,22 @@ def manyperiod_discrete_example(T = 3, transmissionstarmethod = True):
     Vprime = Vprime_get(lastperiodutility, endogstate_list[-1], exogstate_list[-1])
 
 
-    sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
-    from vf_solveback_1endogstate_func import vf_solveback_discrete
-    Vlist, pol_list = vf_solveback_discrete(rewardarray_list, Vprime, transmissionarray_list, beta_list)
+    sys.path.append(str(__projectdir__ / Path('func/')))
+    from solveback_func import vf_solveback_1endogstate_discrete
+    Vlist, pol_list = vf_solveback_1endogstate_discrete(rewardarray_list, Vprime, transmissionarray_list, BETA, T, store = store)
 
     # get the distribution
-    sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
-    from vf_solveback_1endogstate_func import dist_solveback
-    fulldistlist, endogdistlist = dist_solveback([1], [0.5, 0.5], endogstate_list, transmissionarray_list, pol_list, transmissionstarmethod = transmissionstarmethod)
+    if streamdist is True:
+        sys.path.append(str(__projectdir__ / Path('func/')))
+        from solveback_func import dist_meanvar_solveback
+        meandistlist, vardistlist = dist_meanvar_solveback([1], [0.5, 0.5], endogstate_list, transmissionarray_list, pol_list)
+    else:
+        sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+        from vf_solveback_1endogstate_func import dist_solveback
+        fulldistlist, endogdistlist = dist_solveback([1], [0.5, 0.5], endogstate_list, transmissionarray_list, pol_list, transmissionstarmethod = transmissionstarmethod)
 
-    sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
-    from vf_solveback_1endogstate_func import dist_meanvar
-    meandistlist = dist_meanvar(endogdistlist, endogstate_list)
+        sys.path.append(str(__projectdir__ / Path('submodules/vfi-general/')))
+        from vf_solveback_1endogstate_func import dist_meanvar
+        meandistlist = dist_meanvar(endogdistlist, endogstate_list)
 
     print(meandistlist)